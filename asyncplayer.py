@@ -0,0 +1,194 @@
+import asyncio
+import time
+from array import array
+
+from constants import CATCH_UP_COALESCE, CATCH_UP_MODES, CATCH_UP_STRICT
+from events import (
+    OP_BUTTON_PRESS,
+    OP_BUTTON_RELEASE,
+    OP_KEY_PRESS,
+    OP_KEY_RELEASE,
+    OP_MOVE,
+    OP_SCROLL,
+)
+from plan import (
+    NS_PER_SECOND,
+    PlaybackPlan,
+    Schedule,
+    compile_plan,
+    retime_plan,
+    seconds_to_ns,
+)
+from player import catch_up_index
+from timing import summarize_lateness
+
+
+class SyncSink:
+    def __init__(self, backend=None) -> None:
+        if backend is None:
+            from backends import NullBackend
+
+            backend = NullBackend()
+        self.backend = backend
+        self.resolve_button = backend.resolve_button
+        self.resolve_key = backend.resolve_key
+
+    async def move(self, x, y) -> None:
+        self.backend.move(x, y)
+
+    async def press_button(self, x, y, button) -> None:
+        self.backend.press_button(x, y, button)
+
+    async def release_button(self, x, y, button) -> None:
+        self.backend.release_button(x, y, button)
+
+    async def scroll(self, x, y, dx, dy) -> None:
+        self.backend.scroll(x, y, dx, dy)
+
+    async def press_key(self, key) -> None:
+        self.backend.press_key(key)
+
+    async def release_key(self, key) -> None:
+        self.backend.release_key(key)
+
+
+class AsyncPlayer:
+    def __init__(self, sink=None, catch_up=CATCH_UP_COALESCE, now_ns=time.perf_counter_ns):
+        if catch_up not in CATCH_UP_MODES:
+            raise ValueError(f"unknown catch-up policy: {catch_up!r}")
+        self.sink = sink if sink is not None else SyncSink()
+        self.catch_up = catch_up
+        self.is_playing = False
+        self._now_ns = now_ns
+        self._task = None
+        self._stopping = False
+        self._lateness = array("q")
+        self._coalesced = 0
+        self._pass = 0
+        self._expired = False
+
+    def compile(self, events) -> PlaybackPlan:
+        return compile_plan(events, self.sink.resolve_button, self.sink.resolve_key)
+
+    def stop(self) -> None:
+        task = self._task
+        if task is not None and not self._stopping:
+            self._stopping = True
+            task.cancel()
+
+    def timing_stats(self) -> dict:
+        stats = summarize_lateness(self._lateness)
+        stats["coalesced"] = self._coalesced
+        stats["passes"] = self._pass
+        return stats
+
+    async def play(
+        self,
+        events,
+        mode="once",
+        repeat_count=1,
+        loop_seconds=0,
+        speed=1.0,
+        idle_threshold=None,
+        idle_cap=None,
+        idle_only_released=False,
+        gap_seconds=0.0,
+    ) -> bool:
+        if self.is_playing:
+            return False
+        self.is_playing = True
+        self._stopping = False
+        self._lateness = array("q")
+        self._coalesced = 0
+        self._pass = 0
+        self._expired = False
+        try:
+            plan = events if isinstance(events, (PlaybackPlan, Schedule)) else self.compile(events)
+            if speed != 1.0 or idle_threshold is not None:
+                if isinstance(plan, Schedule):
+                    plan = plan.retimed(speed, idle_threshold, idle_cap, idle_only_released)
+                else:
+                    plan = retime_plan(plan, speed, idle_threshold, idle_cap, idle_only_released)
+            task = asyncio.ensure_future(
+                self._run(plan, mode, repeat_count, loop_seconds, gap_seconds)
+            )
+            self._task = task
+            try:
+                await asyncio.wait((task,))
+            finally:
+                task.cancel()
+        finally:
+            self.is_playing = False
+            self._task = None
+        if task.cancelled():
+            return False
+        task.result()
+        return True
+
+    async def _run(self, plan, mode, repeat_count, loop_seconds, gap_seconds) -> None:
+        passes = None
+        if mode == "repeat":
+            passes = max(1, repeat_count)
+        elif mode != "loop":
+            passes = 1
+        gap_ns = seconds_to_ns(max(0.0, gap_seconds))
+        start_ns = self._now_ns()
+        deadline_ns = None
+        if passes is None:
+            deadline_ns = start_ns + seconds_to_ns(max(0.0, loop_seconds))
+        while passes is None or self._pass < passes:
+            if self._expired or (deadline_ns is not None and self._now_ns() >= deadline_ns):
+                break
+            self._pass += 1
+            if isinstance(plan, Schedule):
+                for offset, item in plan.entries:
+                    if self._expired:
+                        break
+                    await self._play_sequence(item, start_ns + offset, deadline_ns)
+            else:
+                await self._play_sequence(plan, start_ns, deadline_ns)
+            start_ns += plan.duration_ns + gap_ns
+
+    async def _play_sequence(self, plan: PlaybackPlan, start_ns: int, deadline_ns) -> None:
+        offsets = plan.offsets
+        opcodes = plan.opcodes
+        lateness = self._lateness
+        now_ns = self._now_ns
+        catch_up = self.catch_up != CATCH_UP_STRICT
+        index = 0
+        count = len(plan)
+        while index < count:
+            target_ns = start_ns + offsets[index]
+            if deadline_ns is not None and target_ns > deadline_ns:
+                self._expired = True
+                return
+            now = now_ns()
+            if target_ns > now:
+                await asyncio.sleep((target_ns - now) / NS_PER_SECOND)
+                now = now_ns()
+            else:
+                await asyncio.sleep(0)
+            if catch_up and opcodes[index] == OP_MOVE:
+                caught_up = catch_up_index(plan, index, now - start_ns, self.catch_up)
+                self._coalesced += caught_up - index
+                index = caught_up
+                target_ns = start_ns + offsets[index]
+            lateness.append(now - target_ns)
+            await self._dispatch(plan, index)
+            index += 1
+
+    async def _dispatch(self, plan: PlaybackPlan, index: int) -> None:
+        opcode = plan.opcodes[index]
+        sink = self.sink
+        if opcode == OP_MOVE:
+            await sink.move(plan.xs[index], plan.ys[index])
+        elif opcode == OP_BUTTON_PRESS:
+            await sink.press_button(plan.xs[index], plan.ys[index], plan.targets[index])
+        elif opcode == OP_BUTTON_RELEASE:
+            await sink.release_button(plan.xs[index], plan.ys[index], plan.targets[index])
+        elif opcode == OP_SCROLL:
+            await sink.scroll(plan.xs[index], plan.ys[index], plan.dxs[index], plan.dys[index])
+        elif opcode == OP_KEY_PRESS:
+            await sink.press_key(plan.targets[index])
+        elif opcode == OP_KEY_RELEASE:
+            await sink.release_key(plan.targets[index])
@@ -0,0 +1,147 @@
+import time
+
+
+class PynputBackend:
+    def __init__(self) -> None:
+        from pynput import keyboard, mouse
+
+        from models import deserialize_button, deserialize_key, serialize_key
+
+        self._keyboard_module = keyboard
+        self._mouse = mouse.Controller()
+        self._keyboard = keyboard.Controller()
+        self._listener = None
+        self._hotkey_listener = None
+        self._serialize_key = serialize_key
+        self.resolve_button = deserialize_button
+        self.resolve_key = deserialize_key
+
+    def start_kill_switch(self, on_stop) -> None:
+        escape = self._keyboard_module.Key.esc
+
+        def on_press(key):
+            if key == escape:
+                on_stop()
+                return False
+            return True
+
+        self._listener = self._keyboard_module.Listener(on_press=on_press)
+        self._listener.start()
+
+    def stop_kill_switch(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def start_hotkeys(self, bindings) -> None:
+        self.stop_hotkeys()
+        serialize_key = self._serialize_key
+
+        def on_press(key):
+            callback = bindings.get(serialize_key(key))
+            if callback is not None:
+                callback()
+            return True
+
+        self._hotkey_listener = self._keyboard_module.Listener(on_press=on_press)
+        self._hotkey_listener.start()
+
+    def stop_hotkeys(self) -> None:
+        if self._hotkey_listener is not None:
+            self._hotkey_listener.stop()
+            self._hotkey_listener = None
+
+    def move(self, x, y) -> None:
+        self._mouse.position = (x, y)
+
+    def press_button(self, x, y, button) -> None:
+        self._mouse.position = (x, y)
+        self._mouse.press(button)
+
+    def release_button(self, x, y, button) -> None:
+        self._mouse.position = (x, y)
+        self._mouse.release(button)
+
+    def scroll(self, x, y, dx, dy) -> None:
+        self._mouse.position = (x, y)
+        self._mouse.scroll(dx, dy)
+
+    def press_key(self, key) -> None:
+        self._keyboard.press(key)
+
+    def release_key(self, key) -> None:
+        self._keyboard.release(key)
+
+
+class NullBackend:
+    hotkeys = {}
+
+    def resolve_button(self, value):
+        if isinstance(value, str) and value.startswith("Button."):
+            return value
+        return None
+
+    def resolve_key(self, value):
+        return value if isinstance(value, str) else None
+
+    def start_kill_switch(self, on_stop) -> None:
+        pass
+
+    def stop_kill_switch(self) -> None:
+        pass
+
+    def start_hotkeys(self, bindings) -> None:
+        self.hotkeys = dict(bindings)
+
+    def stop_hotkeys(self) -> None:
+        self.hotkeys = {}
+
+    def trigger(self, key: str) -> None:
+        callback = self.hotkeys.get(key)
+        if callback is not None:
+            callback()
+
+    def move(self, x, y) -> None:
+        pass
+
+    def press_button(self, x, y, button) -> None:
+        pass
+
+    def release_button(self, x, y, button) -> None:
+        pass
+
+    def scroll(self, x, y, dx, dy) -> None:
+        pass
+
+    def press_key(self, key) -> None:
+        pass
+
+    def release_key(self, key) -> None:
+        pass
+
+
+class CaptureBackend(NullBackend):
+    def __init__(self, clock=None) -> None:
+        self._now_ns = clock.now_ns if clock is not None else time.perf_counter_ns
+        self.actions = []
+
+    def clear(self) -> None:
+        self.actions = []
+
+    def move(self, x, y) -> None:
+        self.actions.append((self._now_ns(), "move", x, y))
+
+    def press_button(self, x, y, button) -> None:
+        self.actions.append((self._now_ns(), "press_button", x, y, button))
+
+    def release_button(self, x, y, button) -> None:
+        self.actions.append((self._now_ns(), "release_button", x, y, button))
+
+    def scroll(self, x, y, dx, dy) -> None:
+        self.actions.append((self._now_ns(), "scroll", x, y, dx, dy))
+
+    def press_key(self, key) -> None:
+        self.actions.append((self._now_ns(), "press_key", key))
+
+    def release_key(self, key) -> None:
+        self.actions.append((self._now_ns(), "release_key", key))
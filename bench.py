@@ -0,0 +1,979 @@
+import argparse
+import math
+import random
+import threading
+import time
+
+
+def synthetic_events(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    events = []
+    t_value = 0.0
+    x_value, y_value = 500, 500
+    held_key = None
+    for index in range(count):
+        t_value += rng.uniform(0.002, 0.02)
+        roll = rng.random()
+        if roll < 0.8:
+            x_value += rng.randint(-8, 8)
+            y_value += rng.randint(-8, 8)
+            events.append({"t": t_value, "type": "mouse_move", "x": x_value, "y": y_value})
+        elif roll < 0.88:
+            events.append(
+                {
+                    "t": t_value,
+                    "type": "mouse_click",
+                    "x": x_value,
+                    "y": y_value,
+                    "button": "Button.left",
+                    "pressed": index % 2 == 0,
+                }
+            )
+        elif roll < 0.92:
+            events.append(
+                {
+                    "t": t_value,
+                    "type": "mouse_scroll",
+                    "x": x_value,
+                    "y": y_value,
+                    "dx": 0,
+                    "dy": rng.choice((-1, 1)),
+                }
+            )
+        elif held_key is None:
+            held_key = rng.choice(("a", "b", "Key.shift", "Key.enter"))
+            events.append({"t": t_value, "type": "key", "action": "press", "key": held_key})
+        else:
+            events.append({"t": t_value, "type": "key", "action": "release", "key": held_key})
+            held_key = None
+    return events
+
+
+def synthetic_drags(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    events = []
+    t_value = 0.0
+    x_value, y_value = 500.0, 500.0
+    heading = 0.0
+    while len(events) < count:
+        events.append(
+            {
+                "t": t_value,
+                "type": "mouse_click",
+                "x": int(x_value),
+                "y": int(y_value),
+                "button": "Button.left",
+                "pressed": True,
+            }
+        )
+        for _ in range(rng.randint(50, 2000)):
+            t_value += 0.008
+            heading += rng.uniform(-0.05, 0.05)
+            x_value += 4 * math.cos(heading)
+            y_value += 4 * math.sin(heading)
+            events.append(
+                {"t": t_value, "type": "mouse_move", "x": int(x_value), "y": int(y_value)}
+            )
+        t_value += 0.05
+        events.append(
+            {
+                "t": t_value,
+                "type": "mouse_click",
+                "x": int(x_value),
+                "y": int(y_value),
+                "button": "Button.left",
+                "pressed": False,
+            }
+        )
+    return events[:count]
+
+
+class StubMouse:
+    def __init__(self) -> None:
+        self.position = (0, 0)
+        self.calls = 0
+
+    def press(self, button) -> None:
+        self.calls += 1
+
+    def release(self, button) -> None:
+        self.calls += 1
+
+    def scroll(self, dx, dy) -> None:
+        self.calls += 1
+
+
+class StubKeyboard:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def press(self, key) -> None:
+        self.calls += 1
+
+    def release(self, key) -> None:
+        self.calls += 1
+
+
+def _make_legacy_dispatch():
+    from backends import NullBackend
+
+    backend = NullBackend()
+    deserialize_button = backend.resolve_button
+    deserialize_key = backend.resolve_key
+
+    def dispatch(mouse_ctl, keyboard_ctl, event: dict) -> None:
+        event_type = event.get("type")
+        if event_type == "mouse_click":
+            button = deserialize_button(event.get("button"))
+            if button is None:
+                return
+            mouse_ctl.position = (event.get("x", 0), event.get("y", 0))
+            if event.get("pressed"):
+                mouse_ctl.press(button)
+            else:
+                mouse_ctl.release(button)
+        elif event_type == "mouse_move":
+            mouse_ctl.position = (event.get("x", 0), event.get("y", 0))
+        elif event_type == "mouse_scroll":
+            mouse_ctl.position = (event.get("x", 0), event.get("y", 0))
+            mouse_ctl.scroll(event.get("dx", 0), event.get("dy", 0))
+        elif event_type == "key":
+            key_value = deserialize_key(event.get("key"))
+            if key_value is None:
+                return
+            action = event.get("action")
+            if action == "press":
+                keyboard_ctl.press(key_value)
+            elif action == "release":
+                keyboard_ctl.release(key_value)
+
+    return dispatch
+
+
+def bench_dispatch(count: int, passes: int) -> None:
+    from backends import NullBackend
+    from player import Player
+
+    legacy_dispatch = _make_legacy_dispatch()
+    events = synthetic_events(count)
+    mouse_ctl = StubMouse()
+    keyboard_ctl = StubKeyboard()
+
+    started = time.perf_counter_ns()
+    for _ in range(passes):
+        for event in events:
+            legacy_dispatch(mouse_ctl, keyboard_ctl, event)
+    legacy_ns = time.perf_counter_ns() - started
+
+    player = Player(backend=NullBackend())
+    started = time.perf_counter_ns()
+    plan = player.compile(events)
+    compile_ns = time.perf_counter_ns() - started
+    started = time.perf_counter_ns()
+    for _ in range(passes):
+        for index in range(len(plan)):
+            player._dispatch(plan, index)
+    compiled_ns = time.perf_counter_ns() - started
+
+    dispatched = count * passes
+    print(f"events={count} passes={passes}")
+    print(f"legacy dispatch:   {legacy_ns / dispatched:8.1f} ns/event")
+    print(f"compiled dispatch: {compiled_ns / dispatched:8.1f} ns/event")
+    print(f"compile (once):    {compile_ns / count:8.1f} ns/event")
+
+
+def bench_timing(count: int, interval_ms: float, guard_ms: float, fake: bool) -> None:
+    from timing import FakeClock, HybridScheduler, PollingScheduler, summarize_lateness
+
+    interval_ns = int(interval_ms * 1_000_000)
+    for name, factory in (("polling", PollingScheduler), ("hybrid", HybridScheduler)):
+        clock = FakeClock(oversleep_ns=1_500_000) if fake else None
+        if factory is HybridScheduler:
+            scheduler = factory(clock=clock, guard_ns=int(guard_ms * 1_000_000))
+        else:
+            scheduler = factory(clock=clock)
+        stop_event = threading.Event()
+        samples = []
+        start_ns = scheduler.now_ns()
+        for index in range(count):
+            target_ns = start_ns + index * interval_ns
+            samples.append(scheduler.sleep_until(target_ns, stop_event) - target_ns)
+        stats = summarize_lateness(samples)
+        print(
+            f"{name:8s} p50={stats['p50_ns'] / 1000:8.1f}us "
+            f"p95={stats['p95_ns'] / 1000:8.1f}us "
+            f"p99={stats['p99_ns'] / 1000:8.1f}us "
+            f"max={stats['max_ns'] / 1000:8.1f}us"
+        )
+
+
+def bench_drift(passes: int, events: int, oversleep_us: float) -> None:
+    from backends import NullBackend
+    from player import Player
+    from timing import FakeClock, HybridScheduler
+
+    def run(legacy: bool) -> None:
+        clock = FakeClock(oversleep_ns=int(oversleep_us * 1000), yield_ns=200_000)
+        player = Player(HybridScheduler(clock=clock), NullBackend())
+        macro = synthetic_events(events)
+        plan = player.compile(macro)
+        started = clock.now_ns()
+        if legacy:
+            for _ in range(passes):
+                player.play(plan)
+        else:
+            player.play(plan, mode="repeat", repeat_count=passes)
+        drift = clock.now_ns() - started - passes * plan.duration_ns
+        print(
+            f"{'per-pass restart' if legacy else 'absolute timeline':>18}: {passes} passes of "
+            f"{plan.duration_ns / 1e9:.3f}s, cumulative drift {drift / 1e6:9.3f}ms"
+        )
+
+    run(True)
+    run(False)
+
+
+class _LegacyRecorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._start_time = time.monotonic()
+        self._events = []
+
+    def _on_move(self, x, y):
+        event = {
+            "t": time.monotonic() - self._start_time,
+            "type": "mouse_move",
+            "x": int(x),
+            "y": int(y),
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def _on_press(self, key):
+        event = {
+            "t": time.monotonic() - self._start_time,
+            "type": "key",
+            "action": "press",
+            "key": key.char,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def get_events(self):
+        with self._lock:
+            return sorted(self._events, key=lambda item: item.get("t", 0.0))
+
+
+class _FakeKey:
+    def __init__(self, char) -> None:
+        self.char = char
+
+
+def _drive_capture(name: str, count: int):
+    from recorder import Recorder
+
+    key = _FakeKey("a")
+    if name == "legacy":
+        recorder = _LegacyRecorder()
+    else:
+        recorder = Recorder()
+        recorder._start_time = time.monotonic()
+    for index in range(count):
+        if index % 10 == 0:
+            recorder._on_press(key)
+        else:
+            recorder._on_move(index * 4, index * 4)
+    return recorder
+
+
+def bench_capture(count: int) -> None:
+    import tracemalloc
+
+    for name in ("legacy", "capture"):
+        started = time.perf_counter_ns()
+        recorder = _drive_capture(name, count)
+        capture_ns = time.perf_counter_ns() - started
+        started = time.perf_counter_ns()
+        events = recorder.get_events()
+        merge_ns = time.perf_counter_ns() - started
+        del recorder, events
+        tracemalloc.start()
+        recorder = _drive_capture(name, count)
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del recorder
+        print(
+            f"{name:8s} callback={capture_ns / count:7.1f} ns/event "
+            f"memory={retained / count:6.1f} B/event "
+            f"get_events={merge_ns / 1e6:8.1f} ms"
+        )
+
+
+def bench_storage(sizes) -> None:
+    import tempfile
+    from pathlib import Path
+
+    from binformat import BinaryMacro
+    from storage import load_macro, save_macro
+
+    print(
+        f"{'events':>9s} {'json MB':>8s} {'bin MB':>8s} "
+        f"{'json load':>10s} {'bin open':>9s} {'bin load':>9s}"
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        for count in sizes:
+            events = synthetic_events(count)
+            json_path = Path(folder) / "macro.json"
+            binary_path = Path(folder) / "macro.mbin"
+            save_macro(events, json_path)
+            save_macro(events, binary_path)
+            del events
+
+            started = time.perf_counter()
+            load_macro(json_path)
+            json_load = time.perf_counter() - started
+            started = time.perf_counter()
+            with BinaryMacro(binary_path) as macro:
+                len(macro)
+                macro[-1]
+            binary_open = time.perf_counter() - started
+            started = time.perf_counter()
+            load_macro(binary_path)
+            binary_load = time.perf_counter() - started
+
+            print(
+                f"{count:9d} {json_path.stat().st_size / 1e6:8.1f} "
+                f"{binary_path.stat().st_size / 1e6:8.1f} {json_load:9.3f}s "
+                f"{binary_open * 1000:7.2f}ms {binary_load:8.3f}s"
+            )
+
+
+def bench_codecs(count: int) -> None:
+    import tempfile
+    from pathlib import Path
+
+    from constants import MACRO_CODECS
+    from storage import _validate_events, load_macro, save_macro
+
+    recordings = {
+        "mixed": _validate_events(synthetic_events(count)),
+        "drags": _validate_events(synthetic_drags(count)),
+    }
+    print(f"{'recording':9s} {'codec':11s} {'KB':>9s} {'ratio':>6s} {'save':>8s} {'load':>8s}")
+    with tempfile.TemporaryDirectory() as folder:
+        for name, events in recordings.items():
+            baseline = None
+            for codec in MACRO_CODECS:
+                path = Path(folder) / f"{name}.{codec.replace('+', '-')}"
+                started = time.perf_counter()
+                save_macro(events, path, created="", codec=codec)
+                saved = time.perf_counter() - started
+                started = time.perf_counter()
+                load_macro(path)
+                loaded = time.perf_counter() - started
+                size = path.stat().st_size
+                baseline = baseline or size
+                print(
+                    f"{name:9s} {codec:11s} {size / 1024:9.1f} {baseline / size:5.1f}x "
+                    f"{saved:7.3f}s {loaded:7.3f}s"
+                )
+
+
+def bench_simplify(count: int, tolerance: float) -> None:
+    import simplify
+
+    events = synthetic_drags(count)
+    numpy_module = simplify.np
+    for name in ("numpy", "python"):
+        if name == "numpy" and numpy_module is None:
+            continue
+        simplify.np = numpy_module if name == "numpy" else None
+        started = time.perf_counter()
+        simplified, report = simplify.simplify_moves(events, tolerance=tolerance)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{name:7s} {elapsed:7.3f}s moves {report['moves_before']} -> "
+            f"{report['moves_after']} (reduction {report['reduction']:.1%})"
+        )
+    simplify.np = numpy_module
+
+
+def bench_startup(runs: int) -> None:
+    import subprocess
+    import sys
+    import tempfile
+    from pathlib import Path
+
+    from storage import save_macro
+
+    root = Path(__file__).resolve().parent
+    with tempfile.TemporaryDirectory() as folder:
+        macro_path = Path(folder) / "macro.json"
+        save_macro(synthetic_events(1000), macro_path)
+        for command in ("inspect", "validate"):
+            best = None
+            for _ in range(runs):
+                started = time.perf_counter()
+                argv = [sys.executable, "-X", "importtime", str(root / "cli.py")]
+                result = subprocess.run(
+                    argv + [command, str(macro_path)],
+                    capture_output=True,
+                    text=True,
+                )
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            imported = {
+                line.rsplit("|", 1)[-1].strip()
+                for line in result.stderr.splitlines()
+                if line.startswith("import time:")
+            }
+            heavy = sorted(
+                name
+                for name in imported
+                if name.split(".")[0] in ("tkinter", "customtkinter", "pynput", "_tkinter")
+            )
+            print(
+                f"cli {command:9s} best={best * 1000:7.1f}ms "
+                f"modules={len(imported)} gui/input imports={heavy or 'none'}"
+            )
+
+
+def bench_ipc(runs: int, events: int) -> None:
+    import subprocess
+    import sys
+    import tempfile
+    from pathlib import Path
+
+    from backends import NullBackend
+    from ipc import ControlClient, ControlServer
+    from service import ControlService
+    from storage import save_macro
+
+    root = Path(__file__).resolve().parent
+    macro = synthetic_events(events)
+    start = macro[0]["t"]
+    macro = [dict(event, t=event["t"] - start) for event in macro]
+    with tempfile.TemporaryDirectory() as folder:
+        macro_path = Path(folder) / "macro.json"
+        save_macro(macro, macro_path)
+        cold = []
+        for _ in range(runs):
+            started = time.perf_counter_ns()
+            argv = [sys.executable, str(root / "cli.py"), "play", str(macro_path)]
+            subprocess.run(argv + ["--backend", "null"], capture_output=True, check=True)
+            cold.append(time.perf_counter_ns() - started)
+        address = str(Path(folder) / "control.sock")
+        server = ControlServer(address, ControlService(backend=NullBackend()))
+        server.start()
+        server.load("macro", macro_path)
+        round_trips = []
+        first_events = []
+        with ControlClient(address) as client:
+            for _ in range(runs):
+                started = time.perf_counter_ns()
+                reply = client.request("play", name="macro", wait=True)
+                round_trips.append(time.perf_counter_ns() - started)
+                first_events.append(reply["start_latency_ns"])
+        server.close()
+    for label, samples in (
+        ("cold cli play (whole process)", cold),
+        ("warm server, play round trip", round_trips),
+        ("warm server, trigger->first event", first_events),
+    ):
+        samples.sort()
+        print(
+            f"{label:>34}: p50 {samples[len(samples) // 2] / 1e6:8.2f}ms  "
+            f"max {samples[-1] / 1e6:8.2f}ms"
+        )
+
+
+def bench_backend(duration: float, intervals_ms) -> None:
+    from backends import CaptureBackend
+    from constants import CATCH_UP_STRICT
+    from player import Player
+    from timing import summarize_lateness
+
+    backend = CaptureBackend()
+    player = Player(backend=backend, catch_up=CATCH_UP_STRICT)
+    print(f"{'interval':>9s} {'events':>8s} {'events/s':>10s} {'p50 err':>9s} {'p99 err':>9s}")
+    for interval_ms in intervals_ms:
+        count = int(duration * 1000 / interval_ms) if interval_ms > 0 else 200_000
+        events = [
+            {"t": index * interval_ms / 1000, "type": "mouse_move", "x": index % 800, "y": 300}
+            for index in range(count)
+        ]
+        plan = player.compile(events)
+        backend.clear()
+        started = time.perf_counter_ns()
+        player.play(plan)
+        elapsed = (time.perf_counter_ns() - started) / 1e9
+        stamps = [action[0] for action in backend.actions]
+        errors = [
+            (stamp - stamps[0]) - (plan.offsets[index] - plan.offsets[0])
+            for index, stamp in enumerate(stamps)
+        ]
+        stats = summarize_lateness(errors)
+        print(
+            f"{interval_ms:7.3f}ms {len(stamps):8d} {len(stamps) / elapsed:10.0f} "
+            f"{stats['p50_ns'] / 1000:7.1f}us {stats['p99_ns'] / 1000:7.1f}us"
+        )
+
+
+def bench_profile(count: int, trace_path) -> None:
+    from pathlib import Path
+
+    from backends import NullBackend
+    from player import Player
+    from profiler import PlaybackProfiler
+
+    events = [dict(event, t=0.0) for event in synthetic_events(count)]
+    player = Player(backend=NullBackend(), catch_up="strict")
+    plan = player.compile(events)
+    for label, enabled in (("disabled", False), ("enabled", True)):
+        best = None
+        for _ in range(3):
+            profiler = PlaybackProfiler() if enabled else None
+            player.profiler = profiler
+            started = time.perf_counter_ns()
+            player.play(plan)
+            elapsed = time.perf_counter_ns() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"profiler {label:8s}: {best / len(plan):7.1f}ns per event")
+    report = profiler.report()
+    for name, stats in report["events"].items():
+        latency = stats["dispatch_latency"]
+        call = stats["backend_call"]
+        print(
+            f"{name:>15}: {latency['count']:8d} dispatched, latency p50 "
+            f"{latency['p50_ns'] / 1000:7.1f}us p99 {latency['p99_ns'] / 1000:7.1f}us, "
+            f"backend p50 {call['p50_ns'] / 1000:6.2f}us"
+        )
+    if trace_path is not None:
+        written = profiler.write_trace(Path(trace_path))
+        print(f"wrote {written} trace events to {trace_path}")
+
+
+def bench_sessions(counts, events: int, interval_ms: float) -> None:
+    import asyncio
+
+    from asyncplayer import AsyncPlayer
+    from timing import summarize_lateness
+
+    macro = [
+        {"t": index * interval_ms / 1000, "type": "mouse_move", "x": index % 800, "y": 300}
+        for index in range(events)
+    ]
+
+    async def run(count: int):
+        players = [AsyncPlayer() for _ in range(count)]
+        plan = players[0].compile(macro)
+        rng = random.Random(count)
+
+        async def session(player) -> None:
+            await asyncio.sleep(rng.uniform(0, interval_ms / 1000))
+            await player.play(plan)
+
+        await asyncio.gather(*(session(player) for player in players))
+        return [sample for player in players for sample in player._lateness]
+
+    print(
+        f"{'sessions':>8s} {'events/s':>10s} {'cpu':>6s} {'sessions/core':>13s} "
+        f"{'p50 err':>9s} {'p99 err':>9s} {'max err':>9s}"
+    )
+    for count in counts:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        samples = asyncio.run(run(count))
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        stats = summarize_lateness(samples)
+        load = cpu / wall
+        print(
+            f"{count:8d} {len(samples) / wall:10.0f} {load * 100:5.0f}% "
+            f"{count / load if load else 0:13.0f} "
+            f"{stats['p50_ns'] / 1e6:7.2f}ms {stats['p99_ns'] / 1e6:7.2f}ms "
+            f"{stats['max_ns'] / 1e6:7.2f}ms"
+        )
+
+
+def bench_telemetry(count: int, interval_ms: float, poll_hz) -> None:
+    import queue
+
+    from backends import NullBackend
+    from player import Player
+
+    class QueueBackend(NullBackend):
+        def __init__(self, updates) -> None:
+            self.updates = updates
+
+        def move(self, x, y) -> None:
+            self.updates.put(("move", x, y))
+
+    events = [
+        {"t": index * interval_ms / 1000, "type": "mouse_move", "x": index % 800, "y": 300}
+        for index in range(count)
+    ]
+
+    def run(player, poll) -> None:
+        plan = player.compile(events)
+        done = threading.Event()
+        polls = 0
+
+        def poller() -> None:
+            nonlocal polls
+            while not done.wait(poll):
+                player.telemetry()
+                polls += 1
+
+        thread = threading.Thread(target=poller, daemon=True) if poll else None
+        if thread is not None:
+            thread.start()
+        started = time.perf_counter()
+        player.play(plan)
+        elapsed = time.perf_counter() - started
+        done.set()
+        if thread is not None:
+            thread.join()
+        return elapsed, polls, player.timing_stats()
+
+    print(
+        f"{'channel':>18s} {'events/s':>10s} {'p99 late':>9s} {'max late':>9s} "
+        f"{'ui updates':>10s}"
+    )
+    rows = [
+        (f"poll {rate:g} Hz" if rate else "none", Player(backend=NullBackend()), rate)
+        for rate in poll_hz
+    ]
+    updates = queue.Queue()
+    rows.append(("per-event queue", Player(backend=QueueBackend(updates)), 0))
+    for name, player, rate in rows:
+        elapsed, polls, stats = run(player, 1.0 / rate if rate else 0)
+        if name == "per-event queue":
+            polls = updates.qsize()
+        print(
+            f"{name:>18s} {count / elapsed:10.0f} {stats['p99_ns'] / 1e3:7.1f}us "
+            f"{stats['max_ns'] / 1e3:7.1f}us {polls:10d}"
+        )
+
+
+def bench_validate(sizes) -> None:
+    from backends import NullBackend
+    from columns import validate_columns
+    from plan import compile_columns, compile_plan
+    import storage
+
+    backend = NullBackend()
+    resolvers = (backend.resolve_button, backend.resolve_key)
+    for count in sizes:
+        raw_events = synthetic_events(count)
+        started = time.perf_counter()
+        expected = storage._validate_events(raw_events)
+        expected_plan = compile_plan(expected, *resolvers)
+        per_event = time.perf_counter() - started
+        started = time.perf_counter()
+        columns = validate_columns(raw_events)
+        plan = compile_columns(columns, *resolvers)
+        vectorized = time.perf_counter() - started
+        same = columns.to_events() == expected and all(
+            getattr(plan, name) == getattr(expected_plan, name)
+            for name in ("offsets", "opcodes", "xs", "ys", "dxs", "dys", "targets")
+        )
+        print(
+            f"{count:9d} per-event={per_event:7.3f}s columnar={vectorized:7.3f}s "
+            f"speedup={per_event / vectorized:5.2f}x {'identical' if same else 'MISMATCH'}"
+        )
+
+
+MEMORY_PROBES = {
+    "baseline": "import storage",
+    "load_macro": "import storage; events = storage.load_macro(path)",
+    "iter_macro": "import storage; events = sum(1 for _ in storage.iter_macro(path))",
+    "load+plan": (
+        "import storage; from plan import compile_plan; from backends import NullBackend; "
+        "b = NullBackend(); "
+        "plan = compile_plan(storage.load_macro(path), b.resolve_button, b.resolve_key)"
+    ),
+    "stream+plan": (
+        "import storage; from plan import compile_plan; from backends import NullBackend; "
+        "b = NullBackend(); "
+        "plan = compile_plan(storage.iter_macro(path), b.resolve_button, b.resolve_key)"
+    ),
+}
+
+
+def bench_memory(sizes) -> None:
+    import subprocess
+    import sys
+    import tempfile
+    from pathlib import Path
+
+    root = Path(__file__).resolve().parent
+    template = (
+        "import resource, sys, time; from pathlib import Path; path = Path(sys.argv[1]); "
+        "started = time.perf_counter(); {probe}; "
+        "print(time.perf_counter() - started, "
+        "resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        for count in sizes:
+            macro_path = Path(folder) / f"macro_{count}.json"
+            writer = (
+                "import json, sys; from bench import synthetic_events; "
+                "events = synthetic_events(int(sys.argv[2])); "
+                "payload = {'version': 1, 'created': '', 'events': events}; "
+                "json.dump(payload, open(sys.argv[1], 'w', encoding='utf-8'))"
+            )
+            subprocess.run(
+                [sys.executable, "-c", writer, str(macro_path), str(count)], cwd=root, check=True
+            )
+            size_mb = macro_path.stat().st_size / 1e6
+            print(f"{count} events, {size_mb:.1f} MB of JSON")
+            for name, probe in MEMORY_PROBES.items():
+                result = subprocess.run(
+                    [sys.executable, "-c", template.format(probe=probe), str(macro_path)],
+                    capture_output=True,
+                    text=True,
+                    cwd=root,
+                    check=True,
+                )
+                elapsed, peak_kb = result.stdout.split()
+                peak_mb = int(peak_kb) / 1024
+                print(f"  {name:12s} {float(elapsed):7.3f}s peak RSS {peak_mb:8.1f} MB")
+            macro_path.unlink()
+
+
+def bench_pipeline(sizes) -> None:
+    import tempfile
+    from pathlib import Path
+
+    from backends import NullBackend
+    from cache import MacroCache
+    from player import Player
+    from storage import iter_macro, load_macro, save_macro
+
+    class FirstEventBackend(NullBackend):
+        def __init__(self) -> None:
+            self.player = None
+            self.first_ns = None
+
+        def _record(self, *args) -> None:
+            if self.first_ns is None:
+                self.first_ns = time.perf_counter_ns()
+                self.player.stop()
+
+        move = press_button = release_button = scroll = press_key = release_key = _record
+
+    def first_event(play) -> float:
+        backend = FirstEventBackend()
+        backend.player = Player(backend=backend)
+        started = time.perf_counter_ns()
+        play(backend.player)
+        return (backend.first_ns - started) / 1e6
+
+    with tempfile.TemporaryDirectory() as folder:
+        for count in sizes:
+            macro_path = Path(folder) / f"macro_{count}.json"
+            save_macro(synthetic_events(count), macro_path)
+            eager = first_event(lambda player: player.play(load_macro(macro_path)))
+            streamed = first_event(lambda player: player.play_stream(iter_macro(macro_path)))
+            gui = first_event(
+                lambda player: MacroCache().stream(macro_path, "plan", player.play_stream)
+            )
+            print(
+                f"{count:9d} events: first event after load+play {eager:9.2f}ms, "
+                f"pipelined {streamed:7.2f}ms, gui cache stream {gui:7.2f}ms"
+            )
+
+
+def bench_service(plays: int, events: int) -> None:
+    import threading
+
+    from backends import NullBackend
+    from player import Player
+    from plan import compile_plan
+    from service import ControlService
+
+    class ListenerBackend(NullBackend):
+        def __init__(self) -> None:
+            self.first_ns = None
+            self._listener = None
+            self._listener_stop = threading.Event()
+
+        def _record(self, *args) -> None:
+            if self.first_ns is None:
+                self.first_ns = time.perf_counter_ns()
+
+        move = press_button = release_button = scroll = press_key = release_key = _record
+
+        def start_kill_switch(self, on_stop) -> None:
+            self._listener_stop.clear()
+            self._listener = threading.Thread(target=self._listener_stop.wait, daemon=True)
+            self._listener.start()
+
+        def stop_kill_switch(self) -> None:
+            self._listener_stop.set()
+            self._listener.join()
+
+        start_hotkeys = start_kill_switch
+
+        def stop_hotkeys(self) -> None:
+            self.stop_kill_switch()
+
+    def report(label, samples) -> None:
+        ordered = sorted(samples)
+        print(
+            f"{label:>22}: p50 {ordered[len(ordered) // 2] / 1e3:8.1f}us  "
+            f"p95 {ordered[int(len(ordered) * 0.95)] / 1e3:8.1f}us  "
+            f"max {ordered[-1] / 1e3:8.1f}us"
+        )
+
+    backend = ListenerBackend()
+    macro = synthetic_events(events)
+    start = macro[0]["t"]
+    macro = [dict(event, t=event["t"] - start) for event in macro]
+    plan = compile_plan(macro, backend.resolve_button, backend.resolve_key)
+    player = Player(backend=backend)
+    samples = []
+    for _ in range(plays):
+        backend.first_ns = None
+        submitted = time.perf_counter_ns()
+        thread = threading.Thread(target=player.play, args=(plan,), daemon=True)
+        thread.start()
+        thread.join()
+        samples.append(backend.first_ns - submitted)
+    report("thread + listener/play", samples)
+
+    backend = ListenerBackend()
+    service = ControlService(backend=backend)
+    service.start()
+    samples = []
+    for _ in range(plays):
+        backend.first_ns = None
+        submitted = time.perf_counter_ns()
+        service.play(plan).wait()
+        samples.append(backend.first_ns - submitted)
+    service.close()
+    report("persistent service", samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Macro Maker micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    dispatch_parser = subparsers.add_parser("dispatch", help="per-event dispatch cost")
+    dispatch_parser.add_argument("--events", type=int, default=50_000)
+    dispatch_parser.add_argument("--passes", type=int, default=10)
+
+    timing_parser = subparsers.add_parser("timing", help="scheduler lateness")
+    timing_parser.add_argument("--events", type=int, default=500)
+    timing_parser.add_argument("--interval-ms", type=float, default=4.0)
+    timing_parser.add_argument("--guard-ms", type=float, default=2.0)
+    timing_parser.add_argument("--fake-clock", action="store_true")
+
+    drift_parser = subparsers.add_parser("drift", help="cumulative drift over repeated passes")
+    drift_parser.add_argument("--passes", type=int, default=1000)
+    drift_parser.add_argument("--events", type=int, default=20)
+    drift_parser.add_argument("--oversleep-us", type=float, default=500.0)
+
+    capture_parser = subparsers.add_parser("capture", help="recorder callback cost")
+    capture_parser.add_argument("--events", type=int, default=200_000)
+
+    storage_parser = subparsers.add_parser("storage", help="JSON vs binary load time and size")
+    storage_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+
+    codecs_parser = subparsers.add_parser("codecs", help="size and speed per save codec")
+    codecs_parser.add_argument("--events", type=int, default=200_000)
+
+    simplify_parser = subparsers.add_parser("simplify", help="mouse path simplification")
+    simplify_parser.add_argument("--events", type=int, default=500_000)
+    simplify_parser.add_argument("--tolerance", type=float, default=1.5)
+
+    startup_parser = subparsers.add_parser("startup", help="headless CLI startup time")
+    startup_parser.add_argument("--runs", type=int, default=5)
+
+    ipc_parser = subparsers.add_parser("ipc", help="control server vs cold CLI trigger latency")
+    ipc_parser.add_argument("--runs", type=int, default=20)
+    ipc_parser.add_argument("--events", type=int, default=1)
+
+    backend_parser = subparsers.add_parser("backend", help="engine throughput via capture backend")
+    backend_parser.add_argument("--seconds", type=float, default=1.0)
+    backend_parser.add_argument(
+        "--intervals-ms", type=float, nargs="+", default=[10.0, 1.0, 0.1, 0.0]
+    )
+
+    memory_parser = subparsers.add_parser("memory", help="peak RSS of full vs streaming JSON load")
+    memory_parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="time to first event while loading")
+    pipeline_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+
+    profile_parser = subparsers.add_parser("profile", help="profiler overhead and breakdown")
+    profile_parser.add_argument("--events", type=int, default=200_000)
+    profile_parser.add_argument("--trace", metavar="PATH")
+
+    sessions_parser = subparsers.add_parser("sessions", help="concurrent asyncio sessions")
+    sessions_parser.add_argument(
+        "--counts", type=int, nargs="+", default=[1, 10, 100, 1000, 5000]
+    )
+    sessions_parser.add_argument("--events", type=int, default=200)
+    sessions_parser.add_argument("--interval-ms", type=float, default=10.0)
+
+    telemetry_parser = subparsers.add_parser("telemetry", help="cost of UI progress polling")
+    telemetry_parser.add_argument("--events", type=int, default=20_000)
+    telemetry_parser.add_argument("--interval-ms", type=float, default=0.1)
+    telemetry_parser.add_argument(
+        "--poll-hz", type=float, nargs="+", default=[0.0, 10.0, 100.0, 1000.0]
+    )
+
+    service_parser = subparsers.add_parser("service", help="play-start latency, back-to-back")
+    service_parser.add_argument("--plays", type=int, default=200)
+    service_parser.add_argument("--events", type=int, default=2)
+
+    validate_parser = subparsers.add_parser("validate", help="per-event vs columnar load-to-plan")
+    validate_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+
+    args = parser.parse_args()
+    if args.bench == "dispatch":
+        bench_dispatch(args.events, args.passes)
+    elif args.bench == "timing":
+        bench_timing(args.events, args.interval_ms, args.guard_ms, args.fake_clock)
+    elif args.bench == "drift":
+        bench_drift(args.passes, args.events, args.oversleep_us)
+    elif args.bench == "capture":
+        bench_capture(args.events)
+    elif args.bench == "storage":
+        bench_storage(args.sizes)
+    elif args.bench == "simplify":
+        bench_simplify(args.events, args.tolerance)
+    elif args.bench == "startup":
+        bench_startup(args.runs)
+    elif args.bench == "ipc":
+        bench_ipc(args.runs, args.events)
+    elif args.bench == "backend":
+        bench_backend(args.seconds, args.intervals_ms)
+    elif args.bench == "codecs":
+        bench_codecs(args.events)
+    elif args.bench == "memory":
+        bench_memory(args.sizes)
+    elif args.bench == "pipeline":
+        bench_pipeline(args.sizes)
+    elif args.bench == "profile":
+        bench_profile(args.events, args.trace)
+    elif args.bench == "sessions":
+        bench_sessions(args.counts, args.events, args.interval_ms)
+    elif args.bench == "telemetry":
+        bench_telemetry(args.events, args.interval_ms, args.poll_hz)
+    elif args.bench == "service":
+        bench_service(args.plays, args.events)
+    elif args.bench == "validate":
+        bench_validate(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import mmap
+import struct
+from pathlib import Path
+
+from events import event_from_fields, event_to_fields
+
+MAGIC = b"MMBN"
+VERSION = 1
+SUFFIX = ".mbin"
+
+HEADER = struct.Struct("<4sHHQdQII")
+RECORD = struct.Struct("<dbxxxiiiii")
+STRING_LENGTH = struct.Struct("<H")
+
+
+def is_binary_macro(path: Path) -> bool:
+    try:
+        with path.open("rb") as handle:
+            return handle.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_binary(events, path: Path, created: str = "") -> None:
+    labels = {}
+    names = []
+    records = []
+    duration = 0.0
+    for event in events:
+        fields = event_to_fields(event)
+        if fields is None:
+            continue
+        t_value, opcode, x, y, dx, dy, label = fields
+        code = 0
+        if label is not None:
+            code = labels.get(label)
+            if code is None:
+                names.append(label)
+                code = labels[label] = len(names)
+        records.append((t_value, opcode, x, y, dx, dy, code))
+        duration = max(duration, t_value)
+
+    created_bytes = created.encode("utf-8")
+    table = bytearray(created_bytes)
+    for name in names:
+        encoded = name.encode("utf-8")
+        table += STRING_LENGTH.pack(len(encoded))
+        table += encoded
+    records_offset = HEADER.size + len(table)
+    padding = -records_offset % 8
+    records_offset += padding
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as handle:
+        handle.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                0,
+                len(records),
+                duration,
+                records_offset,
+                len(names),
+                len(created_bytes),
+            )
+        )
+        handle.write(table)
+        handle.write(b"\0" * padding)
+        pack = RECORD.pack
+        try:
+            handle.writelines(pack(*record) for record in records)
+        except struct.error as exc:
+            raise ValueError(f"event value out of range for binary macro: {exc}") from exc
+
+
+class BinaryMacro:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._handle = path.open("rb")
+        try:
+            self._map = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._handle.close()
+            raise ValueError(f"{path} is empty")
+        try:
+            self._read_header()
+        except (ValueError, struct.error, UnicodeDecodeError):
+            self.close()
+            raise ValueError(f"{path} is not a valid binary macro")
+
+    def _read_header(self) -> None:
+        (
+            magic,
+            version,
+            _flags,
+            count,
+            duration,
+            records_offset,
+            string_count,
+            created_length,
+        ) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("bad header")
+        if records_offset + count * RECORD.size > len(self._map):
+            raise ValueError("truncated records")
+        offset = HEADER.size
+        self.created = bytes(self._map[offset : offset + created_length]).decode("utf-8")
+        offset += created_length
+        names = [None]
+        for _ in range(string_count):
+            (length,) = STRING_LENGTH.unpack_from(self._map, offset)
+            offset += STRING_LENGTH.size
+            names.append(bytes(self._map[offset : offset + length]).decode("utf-8"))
+            offset += length
+        self.count = count
+        self.duration = duration
+        self.names = names
+        self._records_offset = records_offset
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._handle.close()
+
+    def record(self, index: int):
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self._map, self._records_offset + index * RECORD.size)
+
+    def __getitem__(self, index: int) -> dict:
+        if index < 0:
+            index += self.count
+        t_value, opcode, x, y, dx, dy, code = self.record(index)
+        return event_from_fields(t_value, opcode, x, y, dx, dy, self.names[code])
+
+    def records_view(self) -> memoryview:
+        return memoryview(self._map)[
+            self._records_offset : self._records_offset + self.count * RECORD.size
+        ]
+
+    def iter_records(self):
+        view = self.records_view()
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def __iter__(self):
+        names = self.names
+        for t_value, opcode, x, y, dx, dy, code in self.iter_records():
+            event = event_from_fields(t_value, opcode, x, y, dx, dy, names[code])
+            if event is not None:
+                yield event
+
+
+def read_binary(path: Path):
+    with BinaryMacro(path) as macro:
+        return macro.created, list(macro)
@@ -0,0 +1,154 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from constants import MACRO_CACHE_MAX_EVENTS
+from library import file_digest
+from storage import iter_macro, load_macro
+
+
+class _Entry:
+    __slots__ = ("size", "mtime_ns", "digest", "events", "derived")
+
+    def __init__(self, size, mtime_ns, digest, events) -> None:
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+        self.events = events
+        self.derived = {}
+
+    @property
+    def cost(self) -> int:
+        return len(self.events) * (1 + len(self.derived))
+
+
+class MacroCache:
+    def __init__(self, max_events=MACRO_CACHE_MAX_EVENTS, verify_hash=False) -> None:
+        self.max_events = max(0, int(max_events))
+        self.verify_hash = verify_hash
+        self._entries = OrderedDict()
+        self._cost = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.derived_hits = 0
+        self.derived_misses = 0
+
+    def load(self, path: Path):
+        return list(self._entry(path).events)
+
+    def derived(self, path: Path, name: str, factory):
+        entry = self._entry(path)
+        with self._lock:
+            if name in entry.derived:
+                self.derived_hits += 1
+                return entry.derived[name]
+            self.derived_misses += 1
+        value = factory(entry.events)
+        with self._lock:
+            if name not in entry.derived:
+                entry.derived[name] = value
+                if self._entries.get(self._key(path)) is entry:
+                    self._cost += len(entry.events)
+                    self._evict()
+            return entry.derived[name]
+
+    def peek(self, path: Path, name: str):
+        key = self._key(path)
+        stat = Path(path).stat()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or name not in entry.derived:
+                return None
+            if entry.size != stat.st_size or entry.mtime_ns != stat.st_mtime_ns:
+                return None
+            self._entries.move_to_end(key)
+            self.derived_hits += 1
+            return entry.derived[name]
+
+    def stream(self, path: Path, name: str, consume):
+        stat = Path(path).stat()
+        events = []
+        value = consume(_collect(iter_macro(Path(path)), events))
+        if value is not None:
+            digest = file_digest(Path(path)) if self.verify_hash else None
+            fresh = _Entry(stat.st_size, stat.st_mtime_ns, digest, events)
+            fresh.derived[name] = value
+            with self._lock:
+                self._insert(self._key(path), fresh)
+        return value, events
+
+    def invalidate(self, path=None) -> None:
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._cost = 0
+                return
+            entry = self._entries.pop(self._key(path), None)
+            if entry is not None:
+                self._cost -= entry.cost
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "derived_hits": self.derived_hits,
+                "derived_misses": self.derived_misses,
+                "entries": len(self._entries),
+                "events": self._cost,
+                "max_events": self.max_events,
+            }
+
+    def _key(self, path: Path) -> str:
+        return str(Path(path).resolve())
+
+    def _entry(self, path: Path) -> _Entry:
+        key = self._key(path)
+        stat = Path(path).stat()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.size == stat.st_size:
+                if entry.mtime_ns == stat.st_mtime_ns:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+        digest = None
+        if entry is not None and self.verify_hash and entry.size == stat.st_size:
+            digest = file_digest(Path(path))
+            if digest == entry.digest:
+                with self._lock:
+                    entry.mtime_ns = stat.st_mtime_ns
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                return entry
+        events = load_macro(Path(path))
+        if self.verify_hash and digest is None:
+            digest = file_digest(Path(path))
+        fresh = _Entry(stat.st_size, stat.st_mtime_ns, digest, events)
+        with self._lock:
+            self.misses += 1
+            self._insert(key, fresh)
+        return fresh
+
+    def _insert(self, key: str, entry: _Entry) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._cost -= previous.cost
+        self._entries[key] = entry
+        self._cost += entry.cost
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._cost > self.max_events and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._cost -= entry.cost
+            self.evictions += 1
+
+
+def _collect(events, into: list):
+    for event in events:
+        into.append(event)
+        yield event
@@ -0,0 +1,111 @@
+import heapq
+from array import array
+
+from events import event_from_fields
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+class _Chunk:
+    __slots__ = ("t", "ops", "xs", "ys", "dxs", "dys", "labels")
+
+    def __init__(self, size: int) -> None:
+        self.t = array("d", bytes(8 * size))
+        self.ops = array("b", bytes(size))
+        self.xs = array("i", bytes(4 * size))
+        self.ys = array("i", bytes(4 * size))
+        self.dxs = array("i", bytes(4 * size))
+        self.dys = array("i", bytes(4 * size))
+        self.labels = array("i", bytes(4 * size))
+
+
+class CaptureStream:
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE) -> None:
+        self._chunk_size = max(1, int(chunk_size))
+        self._chunks = [_Chunk(self._chunk_size)]
+        self._current = self._chunks[0]
+        self._fill = 0
+        self._count = 0
+        self._label_codes = {}
+        self._label_names = []
+
+    def __len__(self) -> int:
+        return self._count
+
+    def nbytes(self) -> int:
+        per_event = 8 + 1 + 4 * 5
+        live = sum(1 for chunk in self._chunks if chunk is not None)
+        return live * self._chunk_size * per_event
+
+    def _label(self, name: str) -> int:
+        code = self._label_codes.get(name)
+        if code is None:
+            code = len(self._label_names)
+            self._label_names.append(name)
+            self._label_codes[name] = code
+        return code
+
+    def _slot(self):
+        if self._fill == self._chunk_size:
+            self._current = _Chunk(self._chunk_size)
+            self._chunks.append(self._current)
+            self._fill = 0
+        return self._current, self._fill
+
+    def append_move(self, t_value, x, y) -> None:
+        chunk, index = self._slot()
+        chunk.t[index] = t_value
+        chunk.xs[index] = x
+        chunk.ys[index] = y
+        self._fill = index + 1
+        self._count += 1
+
+    def append(self, t_value, opcode, x=0, y=0, dx=0, dy=0, label=None) -> None:
+        chunk, index = self._slot()
+        chunk.t[index] = t_value
+        chunk.ops[index] = opcode
+        chunk.xs[index] = x
+        chunk.ys[index] = y
+        chunk.dxs[index] = dx
+        chunk.dys[index] = dy
+        if label is not None:
+            chunk.labels[index] = self._label(label) + 1
+        self._fill = index + 1
+        self._count += 1
+
+    def iter_events(self, start=0, stop=None):
+        count = self._count if stop is None else min(stop, self._count)
+        names = list(self._label_names)
+        chunks = list(self._chunks)
+        size = self._chunk_size
+        for position in range(max(0, start), count):
+            chunk = chunks[position // size]
+            if chunk is None:
+                raise ValueError("capture events were already released")
+            yield _to_event(chunk, position % size, names)
+
+    def release_before(self, position: int) -> None:
+        for index in range(min(position // self._chunk_size, len(self._chunks) - 1)):
+            self._chunks[index] = None
+
+
+def _to_event(chunk, index, names) -> dict:
+    label = chunk.labels[index]
+    return event_from_fields(
+        chunk.t[index],
+        chunk.ops[index],
+        chunk.xs[index],
+        chunk.ys[index],
+        chunk.dxs[index],
+        chunk.dys[index],
+        names[label - 1] if label else None,
+    )
+
+
+def merge_streams(streams):
+    return list(heapq.merge(*(stream.iter_events() for stream in streams), key=_event_time))
+
+
+def _event_time(event: dict) -> float:
+    return event["t"]
+
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from constants import CHUNK_CACHE_MAX_EVENTS, CHUNK_MAX_EVENTS, CHUNKS_DIR_NAME
+from plan import NS_PER_SECOND, seconds_to_ns
+
+SUFFIX = ".mref"
+HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+class ChunkCache:
+    def __init__(self, max_events=CHUNK_CACHE_MAX_EVENTS) -> None:
+        self.max_events = max(0, int(max_events))
+        self._chunks = OrderedDict()
+        self._cost = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str):
+        with self._lock:
+            events = self._chunks.get(digest)
+            if events is None:
+                self.misses += 1
+                return None
+            self._chunks.move_to_end(digest)
+            self.hits += 1
+            return events
+
+    def put(self, digest: str, events) -> None:
+        with self._lock:
+            previous = self._chunks.pop(digest, None)
+            if previous is not None:
+                self._cost -= len(previous)
+            self._chunks[digest] = events
+            self._cost += len(events)
+            while self._cost > self.max_events and len(self._chunks) > 1:
+                _, evicted = self._chunks.popitem(last=False)
+                self._cost -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "chunks": len(self._chunks),
+                "events": self._cost,
+                "max_events": self.max_events,
+            }
+
+
+SHARED_CACHE = ChunkCache()
+
+
+class ChunkStore:
+    def __init__(self, root: Path, cache=SHARED_CACHE) -> None:
+        self.root = root
+        self.cache = cache
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.json"
+
+    def put(self, events):
+        payload = encode_chunk(events)
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self.path_for(digest)
+        if path.exists():
+            return digest, 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(".tmp")
+        with temporary.open("wb") as handle:
+            handle.write(payload)
+        os.replace(temporary, path)
+        return digest, len(payload)
+
+    def get(self, digest: str):
+        events = self.cache.get(digest)
+        if events is None:
+            with self.path_for(digest).open("rb") as handle:
+                events = json.loads(handle.read())
+            if not isinstance(events, list):
+                raise ValueError(f"chunk {digest} is not a list of events")
+            self.cache.put(digest, events)
+        return events
+
+    def digests(self):
+        if not self.root.is_dir():
+            return
+        for path in self.root.glob("*/*.json"):
+            yield path.stem
+
+    def remove(self, digest: str) -> int:
+        path = self.path_for(digest)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return 0
+        return size
+
+
+def store_for(path: Path) -> ChunkStore:
+    return ChunkStore(path.parent / CHUNKS_DIR_NAME)
+
+
+def encode_chunk(events) -> bytes:
+    return json.dumps(events, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def split_chunks(events, max_events=CHUNK_MAX_EVENTS):
+    chunk = []
+    start_ns = 0
+    for event in events:
+        t_ns = seconds_to_ns(event["t"])
+        boundary = event["type"] == "mouse_click" and event.get("pressed")
+        if chunk and (boundary or len(chunk) >= max_events):
+            yield start_ns, chunk
+            chunk = []
+        if not chunk:
+            start_ns = t_ns
+        relative = dict(event)
+        relative["t"] = t_ns - start_ns
+        chunk.append(relative)
+    if chunk:
+        yield start_ns, chunk
+
+
+def is_manifest(path: Path) -> bool:
+    return path.suffix == SUFFIX
+
+
+def write_manifest(events, path: Path, created: str = "") -> dict:
+    store = store_for(path)
+    chunks = []
+    written = 0
+    for start_ns, chunk in split_chunks(events):
+        digest, size = store.put(chunk)
+        chunks.append([digest, start_ns])
+        written += size
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        json.dump({"version": 1, "created": created, "chunks": chunks}, handle)
+    return {"chunks": len(chunks), "bytes_written": written}
+
+
+def read_manifest(path: Path) -> dict:
+    with path.open("r", encoding="utf-8") as handle:
+        payload = json.load(handle)
+    chunks = payload.get("chunks") if isinstance(payload, dict) else None
+    if not isinstance(chunks, list) or not all(
+        isinstance(entry, list)
+        and len(entry) == 2
+        and _is_digest(entry[0])
+        and isinstance(entry[1], int)
+        for entry in chunks
+    ):
+        raise ValueError(f"{path} is not a macro manifest")
+    return payload
+
+
+def _is_digest(value) -> bool:
+    return isinstance(value, str) and len(value) == 64 and set(value) <= HEX_DIGITS
+
+
+def iter_manifest(path: Path):
+    store = store_for(path)
+    for digest, start_ns in read_manifest(path)["chunks"]:
+        for relative in store.get(digest):
+            if not isinstance(relative, dict):
+                continue
+            event = dict(relative)
+            try:
+                event["t"] = (start_ns + relative["t"]) / NS_PER_SECOND
+            except (KeyError, TypeError):
+                continue
+            yield event
+
+
+def dedupe_report(macros) -> dict:
+    seen = {}
+    files = []
+    logical = 0
+    for name, events in macros:
+        chunks = 0
+        size = 0
+        shared = 0
+        for _start_ns, chunk in split_chunks(events):
+            payload = encode_chunk(chunk)
+            digest = hashlib.sha256(payload).hexdigest()
+            if digest in seen:
+                shared += len(payload)
+            else:
+                seen[digest] = len(payload)
+            chunks += 1
+            size += len(payload)
+        logical += size
+        files.append({"name": name, "chunks": chunks, "bytes": size, "shared_bytes": shared})
+    unique = sum(seen.values())
+    return {
+        "files": files,
+        "chunks": sum(entry["chunks"] for entry in files),
+        "unique_chunks": len(seen),
+        "logical_bytes": logical,
+        "unique_bytes": unique,
+        "savings": 1.0 - unique / logical if logical else 0.0,
+    }
+
+
+def collect_garbage(folder: Path) -> dict:
+    store = ChunkStore(folder / CHUNKS_DIR_NAME)
+    referenced = set()
+    for path in folder.glob("*" + SUFFIX):
+        for digest, _start_ns in read_manifest(path)["chunks"]:
+            referenced.add(digest)
+    removed = 0
+    freed = 0
+    for digest in list(store.digests()):
+        if digest not in referenced:
+            freed += store.remove(digest)
+            removed += 1
+    return {"referenced": len(referenced), "removed": removed, "bytes_freed": freed}
@@ -0,0 +1,495 @@
+import argparse
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+from constants import (
+    CATCH_UP_COALESCE,
+    CATCH_UP_MODES,
+    DEFAULT_LOOP_SECONDS,
+    DEFAULT_REPEAT,
+    DEFAULT_SPEED,
+    MACRO_CODECS,
+    PLAY_MODES,
+)
+
+
+def _load_plan(player, path: Path):
+    from storage import load_columns, load_macro
+
+    try:
+        columns = load_columns(path)
+    except ImportError:
+        return player.compile(load_macro(path))
+    return player.compile_columns(columns)
+
+
+def _seek(player, args, plan):
+    from plan import seconds_to_ns
+    from seek import build_index, seek_plan
+    from storage import load_seek_index
+
+    raw = load_seek_index(args.path)
+    index = player.compile_index(raw) if raw is not None else build_index(plan)
+    start_ns = seconds_to_ns(args.start) if args.start is not None else None
+    if args.start_event is not None:
+        start_ns = plan.offsets[min(max(0, args.start_event), len(plan) - 1)]
+    end_ns = seconds_to_ns(args.end) if args.end is not None else None
+    return seek_plan(plan, start_ns, end_ns, index)
+
+
+def _print_profile(profiler, trace_path: Path) -> None:
+    report = profiler.report()
+    wake = report["wake_error"]
+    print(
+        f"scheduler wake error p50={wake['p50_ns'] / 1e3:.1f}us "
+        f"p99={wake['p99_ns'] / 1e3:.1f}us max={wake['max_ns'] / 1e3:.1f}us"
+    )
+    for name, stats in report["events"].items():
+        latency = stats["dispatch_latency"]
+        call = stats["backend_call"]
+        print(
+            f"  {name:<15} {latency['count']:8d}  latency p50={latency['p50_ns'] / 1e3:.1f}us "
+            f"p99={latency['p99_ns'] / 1e3:.1f}us  backend p50={call['p50_ns'] / 1e3:.1f}us "
+            f"max={call['max_ns'] / 1e3:.1f}us"
+        )
+    written = profiler.write_trace(trace_path)
+    print(f"wrote {written} trace events to {trace_path}")
+
+
+def cmd_play(args) -> int:
+    from composite import is_composite
+    from player import Player
+
+    backend = None
+    if args.backend == "null":
+        from backends import NullBackend
+
+        backend = NullBackend()
+    seeking = args.start is not None or args.end is not None or args.start_event is not None
+    if seeking and (args.stream or is_composite(args.path)):
+        print("--start/--end/--start-event need a plain macro without --stream", file=sys.stderr)
+        return 2
+    profiler = None
+    if args.profile is not None:
+        from profiler import PlaybackProfiler
+
+        profiler = PlaybackProfiler()
+    player = Player(backend=backend, catch_up=args.catch_up, profiler=profiler)
+    options = {
+        "mode": args.mode,
+        "repeat_count": args.repeat,
+        "loop_seconds": args.seconds,
+        "gap_seconds": args.gap,
+        "speed": args.speed,
+        "idle_threshold": args.idle_threshold,
+        "idle_cap": args.idle_cap,
+        "idle_only_released": args.idle_only_released,
+    }
+    try:
+        if is_composite(args.path):
+            from composite import resolve_composite
+
+            player.play(resolve_composite(args.path, player.compile), **options)
+        elif args.stream:
+            from storage import iter_macro
+
+            player.play_stream(iter_macro(args.path), **options)
+        else:
+            plan = _load_plan(player, args.path)
+            if not plan:
+                print(f"{args.path}: no valid events", file=sys.stderr)
+                return 1
+            if seeking:
+                plan = _seek(player, args, plan)
+            player.play(plan, **options)
+    except KeyboardInterrupt:
+        player.stop()
+    except (OSError, ValueError) as exc:
+        print(f"{args.path}: {exc}", file=sys.stderr)
+        return 1
+    report = player.plan_report()
+    if report is not None:
+        print(
+            f"duration per pass {report['original_seconds']:.2f}s -> "
+            f"{report['effective_seconds']:.2f}s ({report['speedup']:.2f}x)"
+        )
+    stats = player.timing_stats()
+    print(
+        f"played {stats['events']} events, lateness "
+        f"p50={stats['p50_ns'] / 1e6:.2f}ms p99={stats['p99_ns'] / 1e6:.2f}ms "
+        f"max={stats['max_ns'] / 1e6:.2f}ms, {stats['coalesced']} late moves coalesced"
+    )
+    if stats["first_event_ns"] is not None:
+        print(f"first event after {stats['first_event_ns'] / 1e6:.2f}ms")
+    if profiler is not None:
+        _print_profile(profiler, args.profile)
+    drift = player.drift_report()
+    if drift is not None and drift["passes"] > 1:
+        print(
+            f"{drift['passes']} passes of {drift['period_ns'] / 1e9:.3f}s, drift "
+            f"last={drift['drift_ns'] / 1e6:.2f}ms max={drift['max_drift_ns'] / 1e6:.2f}ms"
+        )
+    return 0
+
+
+def _inspect_composite(args) -> int:
+    from backends import NullBackend
+    from composite import resolve_composite
+    from player import Player
+
+    try:
+        schedule = resolve_composite(args.path, Player(backend=NullBackend()).compile)
+    except (OSError, ValueError) as exc:
+        print(f"{args.path}: {exc}", file=sys.stderr)
+        return 1
+    summary = {
+        "path": str(args.path),
+        "events": len(schedule),
+        "duration": schedule.duration_ns / 1e9,
+        "references": len(schedule.entries),
+        "unique_segments": len(schedule.plans()),
+        "stored_events": sum(len(plan) for plan in schedule.plans()),
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    print(
+        f"{summary['path']}: {summary['events']} events, {summary['duration']:.3f}s from "
+        f"{summary['references']} segment references ({summary['unique_segments']} unique, "
+        f"{summary['stored_events']} events stored)"
+    )
+    return 0
+
+
+def cmd_inspect(args) -> int:
+    from composite import is_composite
+    from storage import iter_macro
+
+    if is_composite(args.path):
+        return _inspect_composite(args)
+
+    types = Counter()
+    keys = Counter()
+    duration = 0.0
+    try:
+        for event in iter_macro(args.path):
+            types[event["type"]] += 1
+            if event["type"] == "key":
+                keys[event["key"]] += 1
+            duration = max(duration, event["t"])
+    except (OSError, ValueError) as exc:
+        print(f"{args.path}: {exc}", file=sys.stderr)
+        return 1
+    summary = {
+        "path": str(args.path),
+        "events": sum(types.values()),
+        "duration": duration,
+        "types": dict(types),
+        "keys": sorted(keys),
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    print(f"{summary['path']}: {summary['events']} events, {summary['duration']:.3f}s")
+    for name, count in types.most_common():
+        print(f"  {name:14s} {count}")
+    if keys:
+        print(f"  keys: {' '.join(summary['keys'])}")
+    return 0
+
+
+def cmd_convert(args) -> int:
+    from storage import convert_macro, load_macro, save_macro
+
+    if args.simplify is None:
+        try:
+            count = convert_macro(args.source, args.destination, codec=args.codec)
+        except (OSError, ValueError) as exc:
+            print(f"{args.source}: {exc}", file=sys.stderr)
+            return 1
+        print(f"wrote {count} events to {args.destination}")
+        return 0
+
+    from simplify import simplify_moves
+
+    try:
+        events, report = simplify_moves(load_macro(args.source), tolerance=args.simplify)
+        save_macro(events, args.destination, codec=args.codec)
+    except (OSError, ValueError) as exc:
+        print(f"{args.source}: {exc}", file=sys.stderr)
+        return 1
+    print(
+        f"wrote {len(events)} events to {args.destination} "
+        f"(mouse moves reduced by {report['reduction']:.1%})"
+    )
+    return 0
+
+
+def cmd_validate(args) -> int:
+    from storage import check_macro
+
+    failed = 0
+    for path in args.paths:
+        try:
+            total, valid = check_macro(path)
+        except (OSError, ValueError) as exc:
+            print(f"{path}: unreadable ({exc})")
+            failed += 1
+            continue
+        status = "ok" if total == valid else f"{total - valid} invalid"
+        print(f"{path}: {valid}/{total} events valid, {status}")
+        if total != valid:
+            failed += 1
+    return 1 if failed else 0
+
+
+def cmd_list(args) -> int:
+    from library import MacroLibrary
+
+    with MacroLibrary(args.folder) as library:
+        library.refresh()
+        entries = library.query(
+            name=args.name,
+            min_duration=args.min_duration,
+            max_duration=args.max_duration,
+            key=args.key,
+            order=args.order,
+        )
+    for entry in entries:
+        print(f"{entry['name']:40s} {entry['events']:9d} events {entry['duration']:10.1f}s")
+    return 0
+
+
+def cmd_dedupe(args) -> int:
+    from chunkstore import SUFFIX as MANIFEST_SUFFIX
+    from chunkstore import collect_garbage, dedupe_report
+    from library import macro_paths
+    from storage import check_macro, load_macro, save_macro
+
+    paths = macro_paths(args.folder)
+    unreadable = set()
+
+    def readable():
+        for path in paths:
+            try:
+                events = load_macro(path)
+            except (OSError, ValueError) as exc:
+                print(f"{path}: {exc}, skipped", file=sys.stderr)
+                unreadable.add(path)
+                continue
+            yield path.name, events
+
+    report = dedupe_report(readable())
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for entry in report["files"]:
+            print(
+                f"{entry['name']:40s} {entry['chunks']:6d} chunks "
+                f"{entry['shared_bytes'] / max(1, entry['bytes']):6.1%} shared"
+            )
+        print(
+            f"{report['chunks']} chunks, {report['unique_chunks']} unique: "
+            f"{report['logical_bytes']} -> {report['unique_bytes']} bytes "
+            f"({report['savings']:.1%} saved)"
+        )
+    if args.apply:
+        converted = 0
+        for path in paths:
+            if path.suffix == MANIFEST_SUFFIX or path in unreadable:
+                continue
+            destination = path.with_suffix(MANIFEST_SUFFIX)
+            if destination.exists():
+                print(f"{path}: {destination.name} already exists, skipped", file=sys.stderr)
+                continue
+            try:
+                total, valid = check_macro(path)
+            except (OSError, ValueError) as exc:
+                print(f"{path}: {exc}, skipped", file=sys.stderr)
+                continue
+            if valid == 0:
+                print(f"{path}: no valid macro events, skipped", file=sys.stderr)
+                continue
+            if valid != total:
+                print(
+                    f"{path}: {total - valid} of {total} events invalid, skipped",
+                    file=sys.stderr,
+                )
+                continue
+            events = load_macro(path)
+            save_macro(events, destination)
+            if not _same_events(load_macro(destination), events):
+                destination.unlink()
+                print(f"{path}: manifest did not round-trip, kept original", file=sys.stderr)
+                continue
+            path.unlink()
+            converted += 1
+        print(f"converted {converted} macros to {MANIFEST_SUFFIX} manifests")
+    if args.apply or args.gc:
+        collected = collect_garbage(args.folder)
+        print(
+            f"removed {collected['removed']} unreferenced chunks "
+            f"({collected['bytes_freed']} bytes)"
+        )
+    return 0
+
+
+def _same_events(loaded, original) -> bool:
+    from plan import seconds_to_ns
+
+    if len(loaded) != len(original):
+        return False
+    for left, right in zip(loaded, original):
+        if seconds_to_ns(left["t"]) != seconds_to_ns(right["t"]):
+            return False
+        if dict(left, t=0) != dict(right, t=0):
+            return False
+    return True
+
+
+def cmd_serve(args) -> int:
+    from ipc import ControlServer
+    from service import ControlService
+
+    backend = None
+    if args.backend == "null":
+        from backends import NullBackend
+
+        backend = NullBackend()
+    try:
+        server = ControlServer(
+            args.address, ControlService(backend=backend, catch_up=args.catch_up)
+        )
+    except (OSError, ValueError) as exc:
+        print(f"{args.address}: {exc}", file=sys.stderr)
+        return 1
+    try:
+        for path in args.load:
+            loaded = server.load(path.stem, path)
+            print(f"loaded {loaded['name']}: {loaded['events']} events")
+        print(f"listening on {args.address}")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+def cmd_send(args) -> int:
+    from ipc import ControlClient
+
+    fields = {}
+    for name in ("name", "path", "mode", "repeat_count", "loop_seconds", "speed"):
+        value = getattr(args, name)
+        if value is not None:
+            fields[name] = str(value) if isinstance(value, Path) else value
+    if args.wait:
+        fields["wait"] = True
+    with ControlClient(args.address) as client:
+        reply = client.request(args.command, **fields)
+    print(json.dumps(reply, indent=2))
+    return 0 if reply.get("ok") else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli", description="Headless Macro Maker tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    play_parser = subparsers.add_parser("play", help="play a macro file")
+    play_parser.add_argument("path", type=Path)
+    play_parser.add_argument("--mode", choices=PLAY_MODES, default="once")
+    play_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    play_parser.add_argument("--seconds", type=float, default=DEFAULT_LOOP_SECONDS)
+    play_parser.add_argument("--gap", type=float, default=0.0, metavar="SECONDS")
+    play_parser.add_argument("--speed", type=float, default=DEFAULT_SPEED)
+    play_parser.add_argument("--idle-threshold", type=float, metavar="SECONDS")
+    play_parser.add_argument("--idle-cap", type=float, metavar="SECONDS")
+    play_parser.add_argument("--idle-only-released", action="store_true")
+    play_parser.add_argument("--backend", choices=("pynput", "null"), default="pynput")
+    play_parser.add_argument("--catch-up", choices=CATCH_UP_MODES, default=CATCH_UP_COALESCE)
+    play_parser.add_argument("--stream", action="store_true")
+    play_parser.add_argument("--profile", type=Path, metavar="TRACE_JSON")
+    seek_group = play_parser.add_mutually_exclusive_group()
+    seek_group.add_argument("--start", type=float, metavar="SECONDS")
+    seek_group.add_argument("--start-event", type=int, metavar="INDEX")
+    play_parser.add_argument("--end", type=float, metavar="SECONDS")
+    play_parser.set_defaults(handler=cmd_play)
+
+    inspect_parser = subparsers.add_parser("inspect", help="summarize a macro file")
+    inspect_parser.add_argument("path", type=Path)
+    inspect_parser.add_argument("--json", action="store_true")
+    inspect_parser.set_defaults(handler=cmd_inspect)
+
+    convert_parser = subparsers.add_parser("convert", help="convert between JSON and .mbin")
+    convert_parser.add_argument("source", type=Path)
+    convert_parser.add_argument("destination", type=Path)
+    convert_parser.add_argument("--simplify", type=float, metavar="TOLERANCE")
+    convert_parser.add_argument("--codec", choices=MACRO_CODECS)
+    convert_parser.set_defaults(handler=cmd_convert)
+
+    list_parser = subparsers.add_parser("list", help="query the macro library index")
+    list_parser.add_argument("folder", type=Path, nargs="?", default=Path("macros"))
+    list_parser.add_argument("--name")
+    list_parser.add_argument("--key")
+    list_parser.add_argument("--min-duration", type=float)
+    list_parser.add_argument("--max-duration", type=float)
+    list_parser.add_argument(
+        "--order", choices=("name", "duration", "events", "mtime_ns"), default="name"
+    )
+    list_parser.set_defaults(handler=cmd_list)
+
+    dedupe_parser = subparsers.add_parser("dedupe", help="report and remove duplicate segments")
+    dedupe_parser.add_argument("folder", type=Path, nargs="?", default=Path("macros"))
+    dedupe_parser.add_argument("--json", action="store_true")
+    dedupe_parser.add_argument("--apply", action="store_true")
+    dedupe_parser.add_argument("--gc", action="store_true")
+    dedupe_parser.set_defaults(handler=cmd_dedupe)
+
+    serve_parser = subparsers.add_parser("serve", help="run the local control server")
+    serve_parser.add_argument("address", help="socket path, or loopback HOST:PORT for TCP")
+    serve_parser.add_argument("--load", type=Path, nargs="*", default=[])
+    serve_parser.add_argument("--backend", choices=("pynput", "null"), default="pynput")
+    serve_parser.add_argument("--catch-up", choices=CATCH_UP_MODES, default=CATCH_UP_COALESCE)
+    serve_parser.set_defaults(handler=cmd_serve)
+
+    send_parser = subparsers.add_parser("send", help="send one command to a control server")
+    send_parser.add_argument("address")
+    send_parser.add_argument(
+        "command",
+        choices=(
+            "ping",
+            "load",
+            "unload",
+            "play",
+            "stop",
+            "pause",
+            "resume",
+            "status",
+            "shutdown",
+        ),
+    )
+    send_parser.add_argument("name", nargs="?")
+    send_parser.add_argument("--path", type=Path)
+    send_parser.add_argument("--mode", choices=PLAY_MODES)
+    send_parser.add_argument("--repeat", dest="repeat_count", type=int)
+    send_parser.add_argument("--seconds", dest="loop_seconds", type=float)
+    send_parser.add_argument("--speed", type=float)
+    send_parser.add_argument("--wait", action="store_true")
+    send_parser.set_defaults(handler=cmd_send)
+
+    validate_parser = subparsers.add_parser("validate", help="check macro files")
+    validate_parser.add_argument("paths", type=Path, nargs="+")
+    validate_parser.set_defaults(handler=cmd_validate)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+from itertools import repeat
+
+import numpy as np
+
+from events import (
+    OP_BUTTON_PRESS,
+    OP_BUTTON_RELEASE,
+    OP_KEY_PRESS,
+    OP_KEY_RELEASE,
+    OP_MOVE,
+    OP_SCROLL,
+    event_from_fields,
+    event_to_fields,
+)
+
+TYPE_CLICK = 0
+TYPE_MOVE = 1
+TYPE_SCROLL = 2
+TYPE_KEY = 3
+TYPE_CODES = {
+    "mouse_click": TYPE_CLICK,
+    "mouse_move": TYPE_MOVE,
+    "mouse_scroll": TYPE_SCROLL,
+    "key": TYPE_KEY,
+}
+
+_NUMERIC_TYPES = {int, float, bool, type(None)}
+_EXACT_INT_LIMIT = 2.0**53
+_EMPTY = {}
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("t", "<f8"),
+        ("op", "i1"),
+        ("pad", "V3"),
+        ("x", "<i4"),
+        ("y", "<i4"),
+        ("dx", "<i4"),
+        ("dy", "<i4"),
+        ("label", "<i4"),
+    ]
+)
+
+
+class ColumnarFallback(Exception):
+    pass
+
+
+class EventColumns:
+    def __init__(self, t, opcodes, xs, ys, dxs, dys, labels, names) -> None:
+        self.t = t
+        self.opcodes = opcodes
+        self.xs = xs
+        self.ys = ys
+        self.dxs = dxs
+        self.dys = dys
+        self.labels = labels
+        self.names = names
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def to_events(self):
+        names = self.names
+        pool = []
+        positions = []
+        for opcode in (
+            OP_MOVE,
+            OP_BUTTON_PRESS,
+            OP_BUTTON_RELEASE,
+            OP_SCROLL,
+            OP_KEY_PRESS,
+            OP_KEY_RELEASE,
+        ):
+            where = np.nonzero(self.opcodes == opcode)[0]
+            if not len(where):
+                continue
+            positions.append(where)
+            t_values = self.t[where].tolist()
+            if opcode == OP_MOVE:
+                pool.extend(
+                    {"t": t_value, "type": "mouse_move", "x": x, "y": y}
+                    for t_value, x, y in zip(
+                        t_values, self.xs[where].tolist(), self.ys[where].tolist()
+                    )
+                )
+            elif opcode == OP_SCROLL:
+                pool.extend(
+                    {"t": t_value, "type": "mouse_scroll", "x": x, "y": y, "dx": dx, "dy": dy}
+                    for t_value, x, y, dx, dy in zip(
+                        t_values,
+                        self.xs[where].tolist(),
+                        self.ys[where].tolist(),
+                        self.dxs[where].tolist(),
+                        self.dys[where].tolist(),
+                    )
+                )
+            else:
+                pool.extend(
+                    event_from_fields(t_value, opcode, x, y, 0, 0, names[label])
+                    for t_value, x, y, label in zip(
+                        t_values,
+                        self.xs[where].tolist(),
+                        self.ys[where].tolist(),
+                        self.labels[where].tolist(),
+                    )
+                )
+        if not positions:
+            return []
+        order = np.empty(len(pool), dtype=np.int64)
+        order[np.concatenate(positions)] = np.arange(len(pool))
+        return list(map(pool.__getitem__, order.tolist()))
+
+
+def _numeric_array(values):
+    if not set(map(type, values)) <= _NUMERIC_TYPES:
+        return None
+    try:
+        return np.array(values, dtype=np.float64)
+    except OverflowError:
+        return None
+
+
+def _float_column(values):
+    column = _numeric_array(values)
+    if column is not None:
+        missing = values.count(None)
+        ok = ~np.isnan(column)
+        if missing == 0 and ok.all():
+            return column, ok
+        if int(np.count_nonzero(~ok)) != missing:
+            raise ColumnarFallback("NaN values")
+        column[~ok] = 0.0
+        return column, ok
+    coerced = [_coerce_float(value) for value in values]
+    ok = np.array([value is not None for value in coerced], dtype=bool)
+    column = np.array([0.0 if value is None else value for value in coerced], dtype=np.float64)
+    return column, ok
+
+
+def _int_column(values):
+    if set(map(type, values)) <= _NUMERIC_TYPES:
+        try:
+            column = np.array(values, dtype=np.float64)
+        except OverflowError:
+            raise ColumnarFallback("integer outside the float64 range")
+        ok = np.isfinite(column)
+        if np.any(np.abs(column[ok]) >= _EXACT_INT_LIMIT):
+            raise ColumnarFallback("integer outside the exactly representable range")
+        column[~ok] = 0
+        return np.trunc(column).astype(np.int64), ok
+    coerced = [_coerce_int(value) for value in values]
+    ok = np.array([value is not None for value in coerced], dtype=bool)
+    try:
+        column = np.array([0 if value is None else value for value in coerced], dtype=np.int64)
+    except OverflowError:
+        raise ColumnarFallback("integer outside the int64 range")
+    return column, ok
+
+
+def _coerce_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _coerce_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _label_column(values, names, codes):
+    column = np.zeros(len(values), dtype=np.int32)
+    ok = np.zeros(len(values), dtype=bool)
+    for index, value in enumerate(values):
+        if isinstance(value, str):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(names)
+                names.append(value)
+            column[index] = code
+            ok[index] = True
+    return column, ok
+
+
+def validate_columns(raw_events) -> EventColumns:
+    rows = [raw if isinstance(raw, dict) else _EMPTY for raw in raw_events]
+    count = len(rows)
+    type_names = [row.get("type") for row in rows]
+    try:
+        kinds = np.array(list(map(TYPE_CODES.get, type_names, repeat(-1))), dtype=np.int8)
+    except TypeError:
+        kinds = np.array(
+            [TYPE_CODES.get(name, -1) if isinstance(name, str) else -1 for name in type_names],
+            dtype=np.int8,
+        )
+    is_click = kinds == TYPE_CLICK
+    is_move = kinds == TYPE_MOVE
+    is_scroll = kinds == TYPE_SCROLL
+    is_key = kinds == TYPE_KEY
+
+    t, t_ok = _float_column([row.get("t") for row in rows])
+    valid = t_ok & (t >= 0) & (kinds >= 0)
+
+    xs, x_ok = _int_column([row.get("x") for row in rows])
+    ys, y_ok = _int_column([row.get("y") for row in rows])
+    scroll_rows = [rows[index] for index in np.nonzero(is_scroll)[0].tolist()]
+    dxs = np.zeros(count, dtype=np.int64)
+    dys = np.zeros(count, dtype=np.int64)
+    dx_ok = np.zeros(count, dtype=bool)
+    dy_ok = np.zeros(count, dtype=bool)
+    if scroll_rows:
+        dxs[is_scroll], dx_ok[is_scroll] = _int_column([row.get("dx") for row in scroll_rows])
+        dys[is_scroll], dy_ok[is_scroll] = _int_column([row.get("dy") for row in scroll_rows])
+
+    names = [None]
+    codes = {}
+    labels = np.zeros(count, dtype=np.int32)
+    opcodes = np.full(count, OP_MOVE, dtype=np.int8)
+    label_ok = np.zeros(count, dtype=bool)
+    pressed_ok = np.zeros(count, dtype=bool)
+    action_ok = np.zeros(count, dtype=bool)
+
+    click_index = np.nonzero(is_click & valid)[0]
+    if len(click_index):
+        click_rows = [rows[index] for index in click_index.tolist()]
+        column, ok = _label_column([row.get("button") for row in click_rows], names, codes)
+        labels[click_index] = column
+        label_ok[click_index] = ok
+        pressed = [_pressed_value(row.get("pressed")) for row in click_rows]
+        pressed_ok[click_index] = [value is not None for value in pressed]
+        opcodes[click_index] = [
+            OP_BUTTON_PRESS if value else OP_BUTTON_RELEASE for value in pressed
+        ]
+
+    key_index = np.nonzero(is_key & valid)[0]
+    if len(key_index):
+        key_rows = [rows[index] for index in key_index.tolist()]
+        column, ok = _label_column([row.get("key") for row in key_rows], names, codes)
+        labels[key_index] = column
+        label_ok[key_index] = ok
+        actions = [row.get("action") for row in key_rows]
+        action_ok[key_index] = [
+            isinstance(action, str) and action in ("press", "release") for action in actions
+        ]
+        opcodes[key_index] = [
+            OP_KEY_PRESS if action == "press" else OP_KEY_RELEASE for action in actions
+        ]
+
+    opcodes[is_scroll] = OP_SCROLL
+    valid &= (
+        (is_click & x_ok & y_ok & label_ok & pressed_ok)
+        | (is_move & x_ok & y_ok)
+        | (is_scroll & x_ok & y_ok & dx_ok & dy_ok)
+        | (is_key & label_ok & action_ok)
+    )
+
+    selected = np.nonzero(valid)[0]
+    selected_t = t[selected]
+    if len(selected_t) > 1 and not np.all(selected_t[1:] >= selected_t[:-1]):
+        selected = selected[np.argsort(selected_t, kind="stable")]
+    return EventColumns(
+        t[selected],
+        opcodes[selected],
+        xs[selected],
+        ys[selected],
+        dxs[selected],
+        dys[selected],
+        labels[selected],
+        names,
+    )
+
+
+def _pressed_value(value):
+    if isinstance(value, bool):
+        return value
+    if type(value) in (int, float) and value in (0, 1):
+        return bool(value)
+    return None
+
+
+def columns_from_events(events) -> EventColumns:
+    names = [None]
+    codes = {}
+    fields = []
+    for event in events:
+        t_value, opcode, x, y, dx, dy, label = event_to_fields(event)
+        code = 0
+        if label is not None:
+            code = codes.get(label)
+            if code is None:
+                code = codes[label] = len(names)
+                names.append(label)
+        fields.append((t_value, opcode, x, y, dx, dy, code))
+    if not fields:
+        fields = np.zeros((0, 7))
+    table = np.array(fields, dtype=np.float64).reshape(-1, 7)
+    return EventColumns(
+        table[:, 0].copy(),
+        table[:, 1].astype(np.int8),
+        table[:, 2].astype(np.int64),
+        table[:, 3].astype(np.int64),
+        table[:, 4].astype(np.int64),
+        table[:, 5].astype(np.int64),
+        table[:, 6].astype(np.int32),
+        names,
+    )
+
+
+def columns_from_binary(macro) -> EventColumns:
+    view = macro.records_view()
+    try:
+        records = np.frombuffer(view, dtype=RECORD_DTYPE, count=len(macro))
+        columns = EventColumns(
+            records["t"].copy(),
+            records["op"].copy(),
+            records["x"].astype(np.int64),
+            records["y"].astype(np.int64),
+            records["dx"].astype(np.int64),
+            records["dy"].astype(np.int64),
+            records["label"].astype(np.int32),
+            list(macro.names),
+        )
+        del records
+    finally:
+        view.release()
+    return columns
@@ -0,0 +1,125 @@
+import json
+from pathlib import Path
+
+from plan import Schedule, retime_plan, seconds_to_ns, slice_plan
+
+SUFFIX = ".mseq"
+
+
+class Segment:
+    def __init__(self, macro, repeat=1, offset=0.0, gap=0.0, speed=1.0, start=None, end=None):
+        self.macro = macro
+        self.repeat = repeat
+        self.offset = offset
+        self.gap = gap
+        self.speed = speed
+        self.start = start
+        self.end = end
+
+    @property
+    def key(self) -> str:
+        return f"segment:{self.start}:{self.end}:{self.speed}"
+
+
+def is_composite(path: Path) -> bool:
+    return path.suffix == SUFFIX
+
+
+def read_composite(path: Path):
+    with path.open("r", encoding="utf-8") as handle:
+        payload = json.load(handle)
+    raw_segments = payload.get("segments") if isinstance(payload, dict) else None
+    if not isinstance(raw_segments, list):
+        raise ValueError(f"{path} has no segment list")
+    return [_parse_segment(raw, index, path) for index, raw in enumerate(raw_segments)]
+
+
+def write_composite(segments, path: Path) -> None:
+    raw_segments = []
+    for segment in segments:
+        raw = {"macro": segment.macro}
+        for name, default in (
+            ("repeat", 1),
+            ("offset", 0.0),
+            ("gap", 0.0),
+            ("speed", 1.0),
+            ("start", None),
+            ("end", None),
+        ):
+            value = getattr(segment, name)
+            if value != default:
+                raw[name] = value
+        raw_segments.append(raw)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        json.dump({"version": 1, "segments": raw_segments}, handle, indent=2)
+
+
+def _parse_segment(raw, index: int, path: Path) -> Segment:
+    where = f"{path} segment {index}"
+    if not isinstance(raw, dict) or not isinstance(raw.get("macro"), str):
+        raise ValueError(f"{where}: needs a macro name")
+    repeat = raw.get("repeat", 1)
+    if type(repeat) is not int or repeat < 1:
+        raise ValueError(f"{where}: repeat must be a positive integer")
+    values = {}
+    for name, default in (("offset", 0.0), ("gap", 0.0), ("speed", 1.0)):
+        value = raw.get(name, default)
+        if type(value) not in (int, float) or value < 0:
+            raise ValueError(f"{where}: {name} must be a non-negative number")
+        values[name] = float(value)
+    if values["speed"] <= 0:
+        raise ValueError(f"{where}: speed must be positive")
+    for name in ("start", "end"):
+        value = raw.get(name)
+        if value is not None and (type(value) not in (int, float) or value < 0):
+            raise ValueError(f"{where}: {name} must be a non-negative number")
+        values[name] = float(value) if value is not None else None
+    return Segment(raw["macro"], repeat, **values)
+
+
+def resolve_composite(path: Path, compile_plan, cache=None, _stack=()) -> Schedule:
+    from cache import MacroCache
+
+    path = Path(path).resolve()
+    if path in _stack:
+        raise ValueError(f"{path} references itself")
+    cache = cache if cache is not None else MacroCache()
+    schedule = Schedule()
+    cursor = 0
+    for segment in read_composite(path):
+        source = path.parent / segment.macro
+        if is_composite(source):
+            if segment.start is not None or segment.end is not None:
+                raise ValueError(f"{path}: start/end cannot slice composite {segment.macro}")
+            item = resolve_composite(source, compile_plan, cache, _stack + (path,))
+            if segment.speed != 1.0:
+                item = item.retimed(segment.speed)
+        else:
+            item = _segment_plan(source, segment, compile_plan, cache)
+        cursor += seconds_to_ns(segment.offset)
+        for repeat in range(segment.repeat):
+            if repeat:
+                cursor += seconds_to_ns(segment.gap)
+            schedule.add(cursor, item)
+            cursor += item.duration_ns
+    return schedule
+
+
+def _segment_plan(source: Path, segment: Segment, compile_plan, cache):
+    if segment.start is None and segment.end is None and segment.speed == 1.0:
+        return cache.derived(source, "plan", compile_plan)
+
+    def build(_events):
+        plan = cache.derived(source, "plan", compile_plan)
+        if segment.start is not None or segment.end is not None:
+            plan = slice_plan(
+                plan,
+                seconds_to_ns(segment.start) if segment.start is not None else None,
+                seconds_to_ns(segment.end) if segment.end is not None else None,
+            )
+        if segment.speed != 1.0:
+            plan = retime_plan(plan, segment.speed)
+        return plan
+
+    return cache.derived(source, segment.key, build)
@@ -5,10 +5,48 @@ STATUS_RECORDING = "RECORDING"
 STATUS_PLAYING = "PLAYING"
 
 
-KILL_SWITCH_TEXT = "Kill switch: press ESC to stop playback"
+KILL_SWITCH_TEXT = "Hotkeys: ESC stops, F8 pauses, F9 resumes playback"
+UI_POLL_MS = 100
+HOTKEYS = {"stop": "Key.esc", "pause": "Key.f8", "resume": "Key.f9"}
 
 DEFAULT_REPEAT = 2
 DEFAULT_LOOP_SECONDS = 10
+DEFAULT_SPEED = 1.0
 
 MOVE_MIN_INTERVAL = 0.02
 MOVE_MIN_DISTANCE = 3
+
+JOURNAL_BATCH_SIZE = 256
+JOURNAL_FLUSH_INTERVAL = 0.5
+JOURNAL_REORDER_SECONDS = 5.0
+RECOVERY_JOURNAL_NAME = ".recovery.journal"
+
+STREAM_REORDER_SECONDS = 1.0
+
+SIMPLIFY_TOLERANCE = 1.5
+SIMPLIFY_MAX_GAP = 0.1
+
+CATCH_UP_STRICT = "strict"
+CATCH_UP_COALESCE = "coalesce"
+CATCH_UP_SKIP = "skip"
+CATCH_UP_MODES = (CATCH_UP_STRICT, CATCH_UP_COALESCE, CATCH_UP_SKIP)
+
+PLAY_MODES = ("once", "repeat", "loop")
+
+MACRO_CACHE_MAX_EVENTS = 2_000_000
+
+PIPELINE_CHUNK_EVENTS = 2048
+PIPELINE_QUEUE_CHUNKS = 8
+
+CHUNKS_DIR_NAME = ".chunks"
+CHUNK_MAX_EVENTS = 1024
+CHUNK_CACHE_MAX_EVENTS = 100_000
+
+SEEK_CHECKPOINT_EVENTS = 4096
+
+PROFILE_TRACE_EVENTS = 1_000_000
+PROFILE_TRACE_NAME = "last_playback.trace.json"
+
+IPC_MAX_FRAME = 1 << 20
+
+MACRO_CODECS = ("json", "gzip", "lzma", "delta", "delta+gzip", "delta+lzma")
@@ -0,0 +1,61 @@
+OP_MOVE = 0
+OP_BUTTON_PRESS = 1
+OP_BUTTON_RELEASE = 2
+OP_SCROLL = 3
+OP_KEY_PRESS = 4
+OP_KEY_RELEASE = 5
+
+
+def event_to_fields(event: dict):
+    event_type = event.get("type")
+    t_value = float(event.get("t", 0.0))
+    if event_type == "mouse_move":
+        return t_value, OP_MOVE, int(event["x"]), int(event["y"]), 0, 0, None
+    if event_type == "mouse_click":
+        opcode = OP_BUTTON_PRESS if event.get("pressed") else OP_BUTTON_RELEASE
+        return t_value, opcode, int(event["x"]), int(event["y"]), 0, 0, event.get("button")
+    if event_type == "mouse_scroll":
+        return (
+            t_value,
+            OP_SCROLL,
+            int(event["x"]),
+            int(event["y"]),
+            int(event["dx"]),
+            int(event["dy"]),
+            None,
+        )
+    if event_type == "key":
+        opcode = OP_KEY_PRESS if event.get("action") == "press" else OP_KEY_RELEASE
+        return t_value, opcode, 0, 0, 0, 0, event.get("key")
+    return None
+
+
+def event_from_fields(t_value, opcode, x, y, dx, dy, label):
+    if opcode == OP_MOVE:
+        return {"t": t_value, "type": "mouse_move", "x": x, "y": y}
+    if opcode in (OP_BUTTON_PRESS, OP_BUTTON_RELEASE):
+        return {
+            "t": t_value,
+            "type": "mouse_click",
+            "x": x,
+            "y": y,
+            "button": label,
+            "pressed": opcode == OP_BUTTON_PRESS,
+        }
+    if opcode == OP_SCROLL:
+        return {
+            "t": t_value,
+            "type": "mouse_scroll",
+            "x": x,
+            "y": y,
+            "dx": dx,
+            "dy": dy,
+        }
+    if opcode in (OP_KEY_PRESS, OP_KEY_RELEASE):
+        return {
+            "t": t_value,
+            "type": "key",
+            "action": "press" if opcode == OP_KEY_PRESS else "release",
+            "key": label,
+        }
+    return None
@@ -0,0 +1,351 @@
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+from pathlib import Path
+
+from constants import IPC_MAX_FRAME, PLAY_MODES
+
+HEADER = struct.Struct(">I")
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+PLAY_OPTIONS = (
+    "mode",
+    "repeat_count",
+    "loop_seconds",
+    "speed",
+    "idle_threshold",
+    "idle_cap",
+    "idle_only_released",
+    "gap_seconds",
+)
+
+
+def send_frame(sock, message: dict) -> None:
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    if len(body) > IPC_MAX_FRAME:
+        raise ValueError(f"frame of {len(body)} bytes exceeds {IPC_MAX_FRAME}")
+    sock.sendall(HEADER.pack(len(body)) + body)
+
+
+def recv_frame(sock):
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > IPC_MAX_FRAME:
+        raise ValueError(f"frame of {size} bytes exceeds {IPC_MAX_FRAME}")
+    body = _recv_exact(sock, size)
+    if body is None:
+        raise ValueError("connection closed inside a frame")
+    message = json.loads(body)
+    if not isinstance(message, dict):
+        raise ValueError("frame is not a JSON object")
+    return message
+
+
+def _recv_exact(sock, size: int):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            if chunks:
+                raise ValueError("connection closed inside a frame")
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def parse_address(address: str):
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit() and "/" not in address:
+        return (host.strip("[]") or "127.0.0.1", int(port))
+    return address
+
+
+def connect(address: str, timeout=None):
+    target = parse_address(address)
+    if isinstance(target, tuple):
+        sock = socket.create_connection(target, timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(target)
+    return sock
+
+
+class ControlClient:
+    def __init__(self, address: str, timeout=None) -> None:
+        self._sock = connect(address, timeout)
+
+    def request(self, command: str, **fields) -> dict:
+        send_frame(self._sock, dict(fields, cmd=command))
+        reply = recv_frame(self._sock)
+        if reply is None:
+            raise ConnectionError("control server closed the connection")
+        return reply
+
+    def close(self) -> None:
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        control = self.server.control
+        while True:
+            try:
+                message = recv_frame(self.request)
+            except (ValueError, OSError) as exc:
+                try:
+                    send_frame(self.request, {"ok": False, "error": str(exc)})
+                except OSError:
+                    pass
+                return
+            if message is None:
+                return
+            send_frame(self.request, control.handle(message))
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Tcp6Server(_TcpServer):
+    address_family = socket.AF_INET6
+
+
+class ControlServer:
+    def __init__(self, address: str, service=None, cache=None) -> None:
+        from cache import MacroCache
+        from service import ControlService
+
+        target = parse_address(address)
+        if isinstance(target, tuple) and target[0] not in LOOPBACK_HOSTS:
+            raise ValueError(
+                f"refusing to listen on {target[0]}: the control server has no "
+                f"authentication, use one of {', '.join(LOOPBACK_HOSTS)}"
+            )
+        self.address = address
+        self.service = service if service is not None else ControlService()
+        self.cache = cache if cache is not None else MacroCache()
+        self.macros = {}
+        self._last_job = None
+        self._lock = threading.Lock()
+        if isinstance(target, tuple):
+            server_class = _Tcp6Server if target[0] == "::1" else _TcpServer
+            self._server = server_class(target, _Handler)
+        else:
+            _remove_socket(target)
+            self._server = _UnixServer(target, _Handler)
+        self._server.control = self
+        self._serving = False
+        self._thread = None
+        self._handlers = {
+            "ping": self._ping,
+            "load": self._load,
+            "unload": self._unload,
+            "play": self._play,
+            "stop": self._stop,
+            "pause": self._pause,
+            "resume": self._resume,
+            "status": self._status,
+            "shutdown": self._shutdown,
+        }
+
+    @property
+    def server_address(self):
+        return self._server.server_address
+
+    def start(self) -> None:
+        self.service.start()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+            self._thread.start()
+
+    def serve_forever(self) -> None:
+        self.service.start()
+        self._serving = True
+        try:
+            self._server.serve_forever(poll_interval=0.1)
+        finally:
+            self._serving = False
+
+    def close(self) -> None:
+        if self._serving:
+            self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.service.close(timeout=1.0)
+        if not isinstance(parse_address(self.address), tuple):
+            try:
+                _remove_socket(self.address)
+            except FileExistsError:
+                pass
+
+    def load(self, name: str, path: Path) -> dict:
+        plan = self._plan(path)
+        with self._lock:
+            self.macros[name] = path
+        return {"name": name, "events": len(plan), "duration_ns": plan.duration_ns}
+
+    def handle(self, message: dict) -> dict:
+        handler = self._handlers.get(message.get("cmd"))
+        if handler is None:
+            reply = {"ok": False, "error": f"unknown command: {message.get('cmd')!r}"}
+        else:
+            try:
+                reply = dict(handler(message), ok=True)
+            except (OSError, ValueError, KeyError, TypeError, RuntimeError) as exc:
+                reply = {"ok": False, "error": str(exc)}
+        if "id" in message:
+            reply["id"] = message["id"]
+        return reply
+
+    def _plan(self, path: Path):
+        from composite import is_composite, resolve_composite
+
+        player = self.service.player
+        if is_composite(path):
+            return resolve_composite(path, player.compile, self.cache)
+        return self.cache.derived(path, "plan", player.compile)
+
+    def _resolve(self, message: dict) -> Path:
+        if isinstance(message.get("path"), str):
+            return Path(message["path"])
+        with self._lock:
+            path = self.macros.get(message.get("name"))
+        if path is None:
+            raise ValueError(f"no macro loaded as {message.get('name')!r}")
+        return path
+
+    def _ping(self, message: dict) -> dict:
+        return {}
+
+    def _load(self, message: dict) -> dict:
+        if not isinstance(message.get("path"), str):
+            raise ValueError("load needs a path")
+        path = Path(message["path"])
+        return self.load(message.get("name") or path.stem, path)
+
+    def _unload(self, message: dict) -> dict:
+        with self._lock:
+            return {"removed": self.macros.pop(message.get("name"), None) is not None}
+
+    def _play(self, message: dict) -> dict:
+        options = play_options(message)
+        plan = self._plan(self._resolve(message))
+
+        def action(player):
+            player.play(plan, **options)
+            return {"drift": player.drift_report(), "plan": player.plan_report()}
+
+        job = self.service.submit(action)
+        with self._lock:
+            self._last_job = job
+        if not message.get("wait"):
+            return {"queued": True}
+        job.wait()
+        metrics = job_metrics(job)
+        if "error" in metrics:
+            raise RuntimeError(metrics["error"])
+        return metrics
+
+    def _stop(self, message: dict) -> dict:
+        self.service.stop()
+        return {}
+
+    def _pause(self, message: dict) -> dict:
+        self.service.player.pause()
+        return {}
+
+    def _resume(self, message: dict) -> dict:
+        self.service.player.resume()
+        return {}
+
+    def _status(self, message: dict) -> dict:
+        player = self.service.player
+        with self._lock:
+            macros = {name: str(path) for name, path in self.macros.items()}
+            job = self._last_job
+        return {
+            "busy": self.service.busy,
+            "paused": player.is_paused,
+            "telemetry": player.telemetry(),
+            "macros": macros,
+            "last": job_metrics(job) if job is not None and job.done else None,
+        }
+
+    def _shutdown(self, message: dict) -> dict:
+        threading.Thread(target=self._server.shutdown, daemon=True).start()
+        return {}
+
+
+def play_options(message: dict) -> dict:
+    options = {name: message[name] for name in PLAY_OPTIONS if name in message}
+    mode = options.get("mode", "once")
+    if mode not in PLAY_MODES:
+        raise ValueError(f"unknown play mode: {mode!r}")
+    repeat_count = options.get("repeat_count", 1)
+    if type(repeat_count) is not int or repeat_count < 1:
+        raise ValueError("repeat_count must be a positive integer")
+    speed = options.get("speed", 1.0)
+    if type(speed) not in (int, float) or not speed > 0:
+        raise ValueError("speed must be a positive number")
+    for name in ("loop_seconds", "gap_seconds", "idle_threshold", "idle_cap"):
+        value = options.get(name, 0)
+        if value is None and name.startswith("idle_"):
+            continue
+        if type(value) not in (int, float) or not value >= 0:
+            raise ValueError(f"{name} must be a non-negative number")
+    if type(options.get("idle_only_released", False)) is not bool:
+        raise ValueError("idle_only_released must be true or false")
+    return options
+
+
+def _remove_socket(path: str) -> None:
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    os.unlink(path)
+
+
+def job_metrics(job) -> dict:
+    if job.cancelled:
+        return {"cancelled": True}
+    if job.error is not None:
+        return {"error": f"playback failed: {job.error}"}
+    stats = job.stats or {}
+    result = job.result or {}
+    return {
+        "events": stats.get("events", 0),
+        "coalesced": stats.get("coalesced", 0),
+        "lateness_p50_ns": stats.get("p50_ns", 0),
+        "lateness_p99_ns": stats.get("p99_ns", 0),
+        "lateness_max_ns": stats.get("max_ns", 0),
+        "first_event_ns": stats.get("first_event_ns"),
+        "start_latency_ns": job.start_latency_ns,
+        "queued_ns": job.started_ns - job.submitted_ns,
+        "drift": result.get("drift"),
+        "plan": result.get("plan"),
+    }
@@ -0,0 +1,113 @@
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from constants import JOURNAL_BATCH_SIZE, JOURNAL_FLUSH_INTERVAL
+
+SUFFIX = ".journal"
+
+
+class JournalWriter:
+    def __init__(
+        self,
+        path: Path,
+        streams,
+        batch_size=JOURNAL_BATCH_SIZE,
+        flush_interval=JOURNAL_FLUSH_INTERVAL,
+        fsync=True,
+    ) -> None:
+        self.path = path
+        self._streams = list(streams)
+        self._cursors = [0] * len(self._streams)
+        self._batch_size = max(1, int(batch_size))
+        self._flush_interval = max(0.01, float(flush_interval))
+        self._fsync = fsync
+        self._closed = threading.Event()
+        self._thread = None
+        self._handle = None
+        self.written = 0
+
+    def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = self.path.open("w", encoding="utf-8")
+        header = {
+            "version": 1,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._handle.write(json.dumps(header) + "\n")
+        self._sync()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self._closed.set()
+        self._thread.join()
+        self._thread = None
+        self._drain()
+        self._handle.close()
+        self._handle = None
+
+    def _pending(self) -> int:
+        return sum(len(stream) - cursor for stream, cursor in zip(self._streams, self._cursors))
+
+    def _run(self) -> None:
+        poll = min(self._flush_interval, 0.05)
+        last_flush = time.monotonic()
+        while not self._closed.wait(poll):
+            now = time.monotonic()
+            if self._pending() >= self._batch_size or now - last_flush >= self._flush_interval:
+                self._drain()
+                last_flush = now
+
+    def _drain(self) -> None:
+        slices = []
+        ends = []
+        for stream, cursor in zip(self._streams, self._cursors):
+            end = len(stream)
+            ends.append(end)
+            slices.append(stream.iter_events(cursor, end))
+        lines = [
+            json.dumps(event, separators=(",", ":")) + "\n"
+            for event in heapq.merge(*slices, key=_event_time)
+        ]
+        if lines:
+            self._handle.writelines(lines)
+            self._sync()
+            self.written += len(lines)
+        for index, (stream, end) in enumerate(zip(self._streams, ends)):
+            self._cursors[index] = end
+            stream.release_before(end)
+
+    def _sync(self) -> None:
+        self._handle.flush()
+        if self._fsync:
+            os.fsync(self._handle.fileno())
+
+
+def _event_time(event: dict) -> float:
+    return event["t"]
+
+
+def iter_journal(path: Path):
+    with path.open("r", encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            if not line.endswith("\n"):
+                return
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def read_journal_header(path: Path) -> dict:
+    for record in iter_journal(path):
+        if isinstance(record, dict) and "version" in record and "type" not in record:
+            return record
+        break
+    return {}
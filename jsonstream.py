@@ -0,0 +1,105 @@
+import json
+
+WHITESPACE = " \t\n\r"
+NUMBER_CHARS = "0123456789+-.eE"
+
+_decoder = json.JSONDecoder()
+
+
+class _Buffer:
+    def __init__(self, handle, chunk_size: int) -> None:
+        self._handle = handle
+        self._chunk_size = chunk_size
+        self._text = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._handle.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._text = self._text[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            text = self._text
+            pos = self._pos
+            while pos < len(text) and text[pos] in WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(text):
+                return text[pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} in JSON stream")
+        self._pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._text, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise ValueError("malformed JSON value in stream")
+                continue
+            if (end == len(self._text) or self._text[end] in NUMBER_CHARS) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_array_items(handle, key: str, chunk_size: int = 1 << 20):
+    buffer = _Buffer(handle, chunk_size)
+    if buffer.peek() != "{":
+        return
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        return
+    while True:
+        name = buffer.value()
+        buffer.expect(":")
+        if name == key and buffer.peek() == "[":
+            buffer.expect("[")
+            if buffer.peek() == "]":
+                buffer.expect("]")
+            else:
+                while True:
+                    yield buffer.value()
+                    if buffer.peek() == "]":
+                        buffer.expect("]")
+                        break
+                    buffer.expect(",")
+        else:
+            buffer.value()
+        if buffer.peek() == "}":
+            return
+        buffer.expect(",")
+
+
+def read_field(handle, key: str, until=None, chunk_size: int = 1 << 16):
+    buffer = _Buffer(handle, chunk_size)
+    if buffer.peek() != "{":
+        return None
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        return None
+    while True:
+        name = buffer.value()
+        if name == until:
+            return None
+        buffer.expect(":")
+        value = buffer.value()
+        if name == key:
+            return value
+        if buffer.peek() == "}":
+            return None
+        buffer.expect(",")
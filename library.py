@@ -0,0 +1,157 @@
+import hashlib
+import json
+import sqlite3
+from collections import Counter
+from pathlib import Path
+
+from binformat import SUFFIX as BINARY_SUFFIX
+from chunkstore import SUFFIX as MANIFEST_SUFFIX
+from storage import load_macro
+
+INDEX_NAME = ".library.sqlite"
+MACRO_PATTERNS = ("*.json", "*.json.gz", "*.json.xz", "*" + BINARY_SUFFIX, "*" + MANIFEST_SUFFIX)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS macros (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    events INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    types TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS macro_keys (
+    name TEXT NOT NULL REFERENCES macros(name) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    PRIMARY KEY (name, key)
+);
+CREATE INDEX IF NOT EXISTS macro_keys_by_key ON macro_keys(key);
+"""
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def macro_paths(folder: Path):
+    paths = set()
+    for pattern in MACRO_PATTERNS:
+        for path in folder.glob(pattern):
+            if not path.name.startswith(".") and path.is_file():
+                paths.add(path)
+    return sorted(paths)
+
+
+class MacroLibrary:
+    def __init__(self, folder: Path) -> None:
+        self.folder = folder
+        folder.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(folder / INDEX_NAME))
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def refresh(self) -> dict:
+        known = {
+            row["name"]: row
+            for row in self._db.execute("SELECT name, size, mtime_ns, sha256 FROM macros")
+        }
+        seen = set()
+        updated = 0
+        for path in macro_paths(self.folder):
+            seen.add(path.name)
+            stat = path.stat()
+            row = known.get(path.name)
+            if row is not None and row["size"] == stat.st_size:
+                if row["mtime_ns"] == stat.st_mtime_ns:
+                    continue
+                digest = file_digest(path)
+                if digest == row["sha256"]:
+                    self._db.execute(
+                        "UPDATE macros SET mtime_ns = ? WHERE name = ?",
+                        (stat.st_mtime_ns, path.name),
+                    )
+                    continue
+            if self._index_file(path, stat):
+                updated += 1
+        removed = [name for name in known if name not in seen]
+        self._db.executemany("DELETE FROM macros WHERE name = ?", [(name,) for name in removed])
+        self._db.commit()
+        return {"files": len(seen), "updated": updated, "removed": len(removed)}
+
+    def _index_file(self, path: Path, stat) -> bool:
+        try:
+            digest = file_digest(path)
+            events = load_macro(path)
+        except (OSError, ValueError):
+            self._db.execute("DELETE FROM macros WHERE name = ?", (path.name,))
+            return False
+        types = Counter(event["type"] for event in events)
+        keys = {event["key"] for event in events if event["type"] == "key"}
+        self._db.execute("DELETE FROM macros WHERE name = ?", (path.name,))
+        self._db.execute(
+            "INSERT INTO macros (name, size, mtime_ns, sha256, events, duration, types)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                path.name,
+                stat.st_size,
+                stat.st_mtime_ns,
+                digest,
+                len(events),
+                events[-1]["t"] if events else 0.0,
+                json.dumps(dict(types)),
+            ),
+        )
+        self._db.executemany(
+            "INSERT INTO macro_keys (name, key) VALUES (?, ?)",
+            [(path.name, key) for key in sorted(keys)],
+        )
+        return True
+
+    def query(self, name=None, min_duration=None, max_duration=None, key=None, order="name"):
+        clauses = []
+        params = []
+        if name:
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            escaped = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if min_duration is not None:
+            clauses.append("duration >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            clauses.append("duration <= ?")
+            params.append(max_duration)
+        if key is not None:
+            clauses.append("name IN (SELECT name FROM macro_keys WHERE key = ?)")
+            params.append(key)
+        if order not in ("name", "duration", "events", "mtime_ns"):
+            raise ValueError(f"cannot order by {order!r}")
+        sql = "SELECT name, size, mtime_ns, sha256, events, duration, types FROM macros"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order}"
+        results = []
+        for row in self._db.execute(sql, params):
+            entry = dict(row)
+            entry["types"] = json.loads(entry["types"])
+            entry["path"] = self.folder / entry["name"]
+            results.append(entry)
+        return results
+
+    def keys_for(self, name: str):
+        rows = self._db.execute("SELECT key FROM macro_keys WHERE name = ? ORDER BY key", (name,))
+        return [row["key"] for row in rows]
@@ -0,0 +1,182 @@
+import gzip
+import json
+import lzma
+import zlib
+from pathlib import Path
+
+from constants import MACRO_CODECS
+from plan import NS_PER_SECOND, seconds_to_ns
+
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+GZIP_LEVEL = 6
+
+SUFFIX_CODECS = {".gz": "gzip", ".xz": "lzma"}
+
+DELTA_ENCODING = "delta"
+DELTA_PROBE_CHARS = 256
+
+TYPE_LETTERS = {"mouse_move": "m", "mouse_click": "c", "mouse_scroll": "s", "key": "k"}
+LETTER_TYPES = {letter: name for name, letter in TYPE_LETTERS.items()}
+
+
+def codec_for_path(path: Path) -> str:
+    return SUFFIX_CODECS.get(path.suffix, "json")
+
+
+def detect_compression(path: Path):
+    with path.open("rb") as handle:
+        head = handle.read(len(XZ_MAGIC))
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(XZ_MAGIC):
+        return "lzma"
+    return None
+
+
+def open_text(path: Path):
+    compression = detect_compression(path)
+    if compression == "gzip":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if compression == "lzma":
+        return lzma.open(path, "rt", encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+
+def is_delta(path: Path) -> bool:
+    try:
+        with open_text(path) as handle:
+            head = handle.read(DELTA_PROBE_CHARS)
+    except (OSError, EOFError, lzma.LZMAError, zlib.error, UnicodeDecodeError):
+        return False
+    return f'"encoding": "{DELTA_ENCODING}"' in head
+
+
+def write_payload(payload: dict, path: Path, codec: str = "json") -> None:
+    if codec not in MACRO_CODECS:
+        raise ValueError(f"unknown codec: {codec!r}")
+    if DELTA_ENCODING in codec.split("+"):
+        encoded = {
+            "version": payload.get("version", 1),
+            "encoding": DELTA_ENCODING,
+            "created": payload.get("created"),
+        }
+        if "index" in payload:
+            encoded["index"] = payload["index"]
+        encoded["events"] = delta_encode(payload["events"])
+        payload = encoded
+    if codec == "json":
+        text = json.dumps(payload, indent=2)
+    else:
+        text = json.dumps(payload, separators=(", ", ": "))
+    with open_output(path, codec) as handle:
+        handle.write(text)
+
+
+def open_output(path: Path, codec: str = "json"):
+    if codec not in MACRO_CODECS:
+        raise ValueError(f"unknown codec: {codec!r}")
+    compression = codec.split("+")[-1]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=GZIP_LEVEL)
+    if compression == "lzma":
+        return lzma.open(path, "wt", encoding="utf-8")
+    return path.open("w", encoding="utf-8")
+
+
+def read_payload(path: Path):
+    try:
+        with open_text(path) as handle:
+            payload = json.load(handle)
+    except (EOFError, lzma.LZMAError, zlib.error, gzip.BadGzipFile) as exc:
+        raise ValueError(f"{path} is not a readable compressed macro: {exc}") from exc
+    if isinstance(payload, dict) and payload.get("encoding") == DELTA_ENCODING:
+        payload = dict(payload)
+        payload["events"] = delta_decode(payload.get("events"))
+    return payload
+
+
+def delta_encode(events) -> dict:
+    labels = {}
+    types = []
+    t_values = []
+    xs = []
+    ys = []
+    codes = []
+    pressed = []
+    dxs = []
+    dys = []
+    actions = []
+    previous_t = previous_x = previous_y = 0
+    for event in events:
+        kind = event["type"]
+        types.append(TYPE_LETTERS[kind])
+        t_ns = seconds_to_ns(event["t"])
+        t_values.append(t_ns - previous_t)
+        previous_t = t_ns
+        if kind == "key":
+            codes.append(labels.setdefault(event["key"], len(labels)))
+            actions.append("p" if event["action"] == "press" else "r")
+            continue
+        xs.append(event["x"] - previous_x)
+        ys.append(event["y"] - previous_y)
+        previous_x = event["x"]
+        previous_y = event["y"]
+        if kind == "mouse_click":
+            codes.append(labels.setdefault(event["button"], len(labels)))
+            pressed.append("1" if event["pressed"] else "0")
+        elif kind == "mouse_scroll":
+            dxs.append(event["dx"])
+            dys.append(event["dy"])
+    return {
+        "types": "".join(types),
+        "t": t_values,
+        "x": xs,
+        "y": ys,
+        "labels": list(labels),
+        "codes": codes,
+        "pressed": "".join(pressed),
+        "dx": dxs,
+        "dy": dys,
+        "actions": "".join(actions),
+    }
+
+
+def delta_decode(columns):
+    if not isinstance(columns, dict):
+        return []
+    try:
+        labels = columns["labels"]
+        t_values = iter(columns["t"])
+        xs = iter(columns["x"])
+        ys = iter(columns["y"])
+        codes = iter(columns["codes"])
+        pressed = iter(columns["pressed"])
+        dxs = iter(columns["dx"])
+        dys = iter(columns["dy"])
+        actions = iter(columns["actions"])
+        events = []
+        t_ns = x_value = y_value = 0
+        for letter in columns["types"]:
+            kind = LETTER_TYPES[letter]
+            t_ns += next(t_values)
+            event = {"t": t_ns / NS_PER_SECOND, "type": kind}
+            if kind == "key":
+                event["action"] = "press" if next(actions) == "p" else "release"
+                event["key"] = labels[next(codes)]
+            else:
+                x_value += next(xs)
+                y_value += next(ys)
+                event["x"] = x_value
+                event["y"] = y_value
+                if kind == "mouse_click":
+                    event["button"] = labels[next(codes)]
+                    event["pressed"] = next(pressed) == "1"
+                elif kind == "mouse_scroll":
+                    event["dx"] = next(dxs)
+                    event["dy"] = next(dys)
+            events.append(event)
+    except (KeyError, IndexError, TypeError, StopIteration) as exc:
+        raise ValueError(f"malformed delta-encoded events: {exc!r}") from exc
+    return events
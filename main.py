@@ -1,4 +1,3 @@
-import threading
 import sys
 import ctypes
 from pathlib import Path
@@ -15,32 +14,66 @@ from constants import (
     KILL_SWITCH_TEXT,
     DEFAULT_REPEAT,
     DEFAULT_LOOP_SECONDS,
+    DEFAULT_SPEED,
+    RECOVERY_JOURNAL_NAME,
+    PROFILE_TRACE_NAME,
+    UI_POLL_MS,
 )
+from cache import MacroCache
+from library import MacroLibrary
+from profiler import PlaybackProfiler
 from recorder import Recorder
-from player import Player
-from storage import save_macro, load_macro
+from service import ControlService
+from storage import convert_macro, recover_journal, save_macro
 
 
 class MacroApp:
     def __init__(self, root: ctk.CTk) -> None:
         self.root = root
         self.root.title(APP_TITLE)
-        self.root.geometry("520x380")
+        self.root.geometry("520x480")
         self.root.resizable(False, False)
         self.root.configure(fg_color="#0E1116")
 
         self.recorder = Recorder()
-        self.player = Player()
+        self.service = ControlService()
+        self.player = self.service.player
         self.events = []
+        self.events_path = None
+        self.events_recorded = False
+        self.macro_cache = MacroCache()
 
         self.macros_dir = Path(__file__).resolve().parent / "macros"
         self.macros_dir.mkdir(parents=True, exist_ok=True)
+        self.journal_path = self.macros_dir / RECOVERY_JOURNAL_NAME
+        self.trace_path = Path(__file__).resolve().parent / "traces" / PROFILE_TRACE_NAME
+        self.library = MacroLibrary(self.macros_dir)
 
         self._build_ui()
         self._set_status(STATUS_READY)
+        self._recover_session()
         self._update_event_count()
         self._update_controls()
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self._poll_job = self.root.after(UI_POLL_MS, self._poll_telemetry)
+        self.service.start()
+
+    def _recover_session(self) -> None:
+        if not self.journal_path.exists():
+            return
+        events = recover_journal(self.journal_path)
+        if events and messagebox.askyesno(
+            APP_TITLE,
+            f"Recover {len(events)} events from an unfinished recording session?",
+        ):
+            self.events = events
+        self._discard_journal()
+
+    def _discard_journal(self) -> None:
+        try:
+            self.journal_path.unlink()
+        except FileNotFoundError:
+            pass
 
     def _build_ui(self) -> None:
         container = ctk.CTkFrame(
@@ -193,6 +226,56 @@ class MacroApp:
         )
         loop_entry.grid(row=2, column=1, padx=(10, 0), sticky="w")
 
+        label_style = {
+            "text_color": "#E8EAED",
+            "font": ctk.CTkFont(family="Segoe UI", size=10),
+        }
+        ctk.CTkLabel(options_frame, text="Speed (x)", **label_style).grid(
+            row=3, column=0, sticky="w", pady=(4, 0)
+        )
+        self.speed_var = tk.StringVar(value=str(DEFAULT_SPEED))
+        speed_entry = ctk.CTkEntry(
+            options_frame,
+            textvariable=self.speed_var,
+            width=64,
+            height=26,
+            corner_radius=8,
+            fg_color="#242B33",
+            text_color="#E8EAED",
+            border_color="#2F3742",
+            border_width=1,
+        )
+        speed_entry.grid(row=3, column=1, padx=(10, 0), pady=(4, 0), sticky="w")
+
+        ctk.CTkLabel(
+            options_frame,
+            text="Cap pauses longer than (seconds)",
+            **label_style,
+        ).grid(row=4, column=0, sticky="w")
+        self.idle_cap_var = tk.StringVar(value="")
+        idle_entry = ctk.CTkEntry(
+            options_frame,
+            textvariable=self.idle_cap_var,
+            width=64,
+            height=26,
+            corner_radius=8,
+            fg_color="#242B33",
+            text_color="#E8EAED",
+            border_color="#2F3742",
+            border_width=1,
+        )
+        idle_entry.grid(row=4, column=1, padx=(10, 0), sticky="w")
+
+        self.profile_var = tk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            options_frame,
+            text="Profile playback (writes a trace file)",
+            variable=self.profile_var,
+            checkbox_width=16,
+            checkbox_height=16,
+            **radio_style,
+        ).grid(row=5, column=0, columnspan=2, sticky="w", pady=(4, 0))
+
         kill_label = ctk.CTkLabel(
             container,
             text=KILL_SWITCH_TEXT,
@@ -205,12 +288,34 @@ class MacroApp:
         self.status_var.set(text)
 
     def _update_event_count(self) -> None:
+        if not self.events and self.events_path is not None:
+            self.event_count_var.set(f"Macro: {self.events_path.name} (loads while playing)")
+            return
         self.event_count_var.set(f"Events: {len(self.events)}")
 
+    def _poll_telemetry(self) -> None:
+        text = None
+        if self.recorder.is_recording:
+            stats = self.recorder.telemetry()
+            text = f"Recording: {stats['events']} events  |  {stats['elapsed_seconds']:.1f}s"
+        elif self.player.is_playing:
+            stats = self.player.telemetry()
+            if stats["playing"]:
+                text = (
+                    f"Playing: {stats['position']}/{stats['events']}  |  "
+                    f"{stats['elapsed_ns'] / 1e9:.1f}s / {stats['planned_ns'] / 1e9:.1f}s  |  "
+                    f"late {stats['lateness_ns'] / 1e6:.1f}ms"
+                )
+                if stats["pass"] > 1:
+                    text += f"  |  pass {stats['pass']}"
+        if text is not None and text != self.event_count_var.get():
+            self.event_count_var.set(text)
+        self._poll_job = self.root.after(UI_POLL_MS, self._poll_telemetry)
+
     def _update_controls(self) -> None:
         is_recording = self.recorder.is_recording
-        is_playing = self.player.is_playing
-        has_events = bool(self.events)
+        is_playing = self.service.busy
+        has_events = bool(self.events) or self.events_path is not None
 
         self.record_btn.configure(state="disabled" if is_recording or is_playing else "normal")
         self.stop_btn.configure(state="normal" if is_recording or is_playing else "disabled")
@@ -223,11 +328,13 @@ class MacroApp:
         self.load_btn.configure(state="normal" if not (is_recording or is_playing) else "disabled")
 
     def start_recording(self) -> None:
-        if self.player.is_playing:
+        if self.service.busy:
             return
         self.events = []
+        self.events_path = None
+        self.events_recorded = False
         self._update_event_count()
-        self.recorder.start()
+        self.recorder.start(journal_path=self.journal_path)
         self._set_status(STATUS_RECORDING)
         self._update_controls()
 
@@ -235,77 +342,227 @@ class MacroApp:
         if self.recorder.is_recording:
             self.recorder.stop()
             self.events = self.recorder.get_events()
+            self.events_path = None
+            self.events_recorded = True
             self._set_status(STATUS_READY)
-        elif self.player.is_playing:
-            self.player.stop()
+        elif self.service.busy:
+            self.service.stop()
             self._set_status(STATUS_READY)
         self._update_event_count()
         self._update_controls()
 
     def play_macro(self) -> None:
-        if self.recorder.is_recording or self.player.is_playing:
+        if self.recorder.is_recording or self.service.busy:
             return
-        if not self.events:
+        if not self.events and self.events_path is None:
             messagebox.showinfo(APP_TITLE, "No events to play yet.")
             return
 
         mode = self.play_mode.get()
         repeat_count = self._parse_int(self.repeat_var.get(), DEFAULT_REPEAT)
         loop_seconds = self._parse_float(self.loop_var.get(), DEFAULT_LOOP_SECONDS)
+        speed = self._parse_float(self.speed_var.get(), DEFAULT_SPEED)
+        idle_cap = self._parse_float(self.idle_cap_var.get(), None)
 
         self._set_status(STATUS_PLAYING)
         self._update_controls()
 
-        def runner():
-            self.player.play(
-                list(self.events),
-                mode=mode,
-                repeat_count=repeat_count,
-                loop_seconds=loop_seconds,
-            )
-            self.root.after(0, self._on_playback_finished)
-
-        threading.Thread(target=runner, daemon=True).start()
+        events = list(self.events)
+        events_path = self.events_path
+        profiler = PlaybackProfiler() if self.profile_var.get() else None
+
+        options = {
+            "mode": mode,
+            "repeat_count": repeat_count,
+            "loop_seconds": loop_seconds,
+            "speed": speed,
+            "idle_threshold": idle_cap,
+            "idle_only_released": True,
+        }
 
-    def _on_playback_finished(self) -> None:
+        def action(player):
+            player.profiler = profiler
+            loaded = None
+            plan = None
+            if events_path is not None:
+                plan = self.macro_cache.peek(events_path, "plan")
+            if plan is not None:
+                player.play(plan, **options)
+                if not events:
+                    loaded = self.macro_cache.load(events_path)
+            elif events_path is not None:
+                plan, loaded = self.macro_cache.stream(
+                    events_path, "plan", lambda source: player.play_stream(source, **options)
+                )
+            else:
+                player.play_stream(events, **options)
+            if profiler is not None:
+                profiler.write_trace(self.trace_path)
+            if loaded is None or plan is None:
+                return None
+            return events_path, loaded
+
+        self.service.submit(action, on_done=self._on_job_done)
+
+    def _on_job_done(self, job) -> None:
+        self.root.after(0, self._on_playback_finished, job)
+
+    def _on_playback_finished(self, job) -> None:
         self._set_status(STATUS_READY)
         self._update_controls()
+        if job.error is not None:
+            messagebox.showerror(APP_TITLE, f"Playback failed: {job.error}")
+            return
+        if job.result is not None:
+            events_path, loaded = job.result
+            if events_path == self.events_path and not self.events:
+                self.events = loaded
+                if not loaded:
+                    messagebox.showwarning(APP_TITLE, "No valid events found in that file.")
+                    self.events_path = None
+                    self._update_event_count()
+                    self._update_controls()
+                    return
+        report = self.player.plan_report()
+        if report is not None:
+            text = (
+                f"Events: {len(self.events)}  |  "
+                f"{report['original_seconds']:.1f}s -> {report['effective_seconds']:.1f}s per pass"
+            )
+            profiler = self.player.profiler
+            if profiler is not None:
+                wake = profiler.report()["wake_error"]
+                text += f"  |  wake p99 {wake['p99_ns'] / 1e3:.0f}us, trace in traces/"
+            self.event_count_var.set(text)
 
     def _on_close(self) -> None:
+        self.root.after_cancel(self._poll_job)
         if self.recorder.is_recording:
             self.recorder.stop()
-        if self.player.is_playing:
-            self.player.stop()
+        self.service.close(timeout=1.0)
+        self._discard_journal()
+        self.library.close()
         self.root.destroy()
 
     def save_macro_dialog(self) -> None:
-        if not self.events:
+        if not self.events and self.events_path is None:
             messagebox.showinfo(APP_TITLE, "No recorded events to save.")
             return
         default_name = "macro.json"
         path = filedialog.asksaveasfilename(
             title="Save Macro",
             defaultextension=".json",
-            filetypes=[("Macro JSON", "*.json")],
+            filetypes=[
+                ("Macro JSON", "*.json"),
+                ("Compressed JSON (gzip)", "*.json.gz"),
+                ("Compressed JSON (xz)", "*.json.xz"),
+                ("Binary macro", "*.mbin"),
+                ("Deduplicated macro", "*.mref"),
+            ],
             initialdir=str(self.macros_dir),
             initialfile=default_name,
         )
         if not path:
             return
-        save_macro(self.events, Path(path))
+        if self.events_recorded and self.journal_path.exists():
+            self.recorder.save(Path(path))
+        elif self.events:
+            save_macro(self.events, Path(path))
+        else:
+            convert_macro(self.events_path, Path(path))
 
     def load_macro_dialog(self) -> None:
+        self.library.refresh()
+        window = ctk.CTkToplevel(self.root)
+        window.title("Macro Library")
+        window.geometry("480x380")
+        window.configure(fg_color="#0E1116")
+        window.transient(self.root)
+
+        search_var = tk.StringVar()
+        search_entry = ctk.CTkEntry(
+            window,
+            textvariable=search_var,
+            placeholder_text="Filter by name",
+            height=28,
+            corner_radius=8,
+            fg_color="#242B33",
+            text_color="#E8EAED",
+            border_color="#2F3742",
+            border_width=1,
+        )
+        search_entry.pack(fill="x", padx=12, pady=(12, 6))
+
+        list_frame = ctk.CTkScrollableFrame(window, fg_color="#151A21", corner_radius=14)
+        list_frame.pack(fill="both", expand=True, padx=12, pady=(0, 6))
+
+        row_style = {
+            "fg_color": "#2A3038",
+            "hover_color": "#343B45",
+            "text_color": "#E8EAED",
+            "corner_radius": 8,
+            "height": 28,
+            "anchor": "w",
+            "font": ctk.CTkFont(family="Segoe UI", size=10),
+        }
+
+        def choose(path: Path) -> None:
+            window.destroy()
+            self._load_macro_file(path)
+
+        def render(*_args) -> None:
+            for child in list_frame.winfo_children():
+                child.destroy()
+            for entry in self.library.query(name=search_var.get().strip() or None):
+                ctk.CTkButton(
+                    list_frame,
+                    text=(
+                        f"{entry['name']}  |  {entry['events']} events  |  "
+                        f"{entry['duration']:.1f}s"
+                    ),
+                    command=lambda path=entry["path"]: choose(path),
+                    **row_style,
+                ).pack(fill="x", padx=4, pady=2)
+
+        def browse() -> None:
+            window.destroy()
+            self._browse_macro_file()
+
+        ctk.CTkButton(
+            window,
+            text="Browse...",
+            command=browse,
+            fg_color="#2A3038",
+            hover_color="#343B45",
+            text_color="#E8EAED",
+            corner_radius=10,
+            width=92,
+            height=30,
+        ).pack(pady=(0, 12))
+
+        search_var.trace_add("write", render)
+        render()
+
+    def _browse_macro_file(self) -> None:
         path = filedialog.askopenfilename(
             title="Load Macro",
-            filetypes=[("Macro JSON", "*.json")],
+            filetypes=[
+                ("Macros", "*.json *.json.gz *.json.xz *.mbin *.mref"),
+                ("Macro JSON", "*.json"),
+                ("Compressed JSON", "*.json.gz *.json.xz"),
+                ("Binary macro", "*.mbin"),
+                ("Deduplicated macro", "*.mref"),
+            ],
             initialdir=str(self.macros_dir),
         )
         if not path:
             return
-        events = load_macro(Path(path))
-        if not events:
-            messagebox.showwarning(APP_TITLE, "No valid events found in that file.")
-        self.events = events
+        self._load_macro_file(Path(path))
+
+    def _load_macro_file(self, path: Path) -> None:
+        self.events = []
+        self.events_path = path
+        self.events_recorded = False
         self._update_event_count()
         self._update_controls()
 
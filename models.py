@@ -1,6 +1,3 @@
-from pynput import keyboard, mouse
-
-
 def serialize_key(key) -> str:
     try:
         return key.char
@@ -12,6 +9,8 @@ def deserialize_key(value):
     if not isinstance(value, str):
         return None
     if value.startswith("Key."):
+        from pynput import keyboard
+
         name = value.split(".", 1)[1]
         return getattr(keyboard.Key, name, None)
     return value
@@ -25,6 +24,8 @@ def deserialize_button(value):
     if not isinstance(value, str):
         return None
     if value.startswith("Button."):
+        from pynput import mouse
+
         name = value.split(".", 1)[1]
         return getattr(mouse.Button, name, None)
     return None
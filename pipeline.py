@@ -0,0 +1,89 @@
+import queue
+import threading
+from itertools import islice
+
+from constants import PIPELINE_CHUNK_EVENTS, PIPELINE_QUEUE_CHUNKS
+from plan import compile_plan
+
+POLL_SECONDS = 0.05
+
+_DONE = object()
+
+
+class PlanLoader:
+    def __init__(
+        self,
+        events,
+        resolve_button=None,
+        resolve_key=None,
+        chunk_events=PIPELINE_CHUNK_EVENTS,
+        max_chunks=PIPELINE_QUEUE_CHUNKS,
+    ) -> None:
+        self._events = events
+        self._resolve_button = resolve_button
+        self._resolve_key = resolve_key
+        self._chunk_events = max(1, int(chunk_events))
+        self._queue = queue.Queue(maxsize=max(1, int(max_chunks)))
+        self._cancel = threading.Event()
+        self._thread = None
+        self.exhausted = False
+        self.loaded = 0
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        self._cancel.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def next_chunk(self, stop_event=None):
+        if self.exhausted:
+            return None
+        self.start()
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return None
+            try:
+                item = self._queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                self.exhausted = True
+                return None
+            if isinstance(item, BaseException):
+                self.exhausted = True
+                raise item
+            self.loaded += len(item)
+            return item
+
+    def _run(self) -> None:
+        events = iter(self._events)
+        try:
+            while not self._cancel.is_set():
+                batch = list(islice(events, self._chunk_events))
+                if not batch:
+                    break
+                chunk = compile_plan(batch, self._resolve_button, self._resolve_key)
+                if chunk and not self._put(chunk):
+                    return
+        except Exception as exc:
+            self._put(exc)
+            return
+        finally:
+            close = getattr(events, "close", None)
+            if close is not None:
+                close()
+        self._put(_DONE)
+
+    def _put(self, item) -> bool:
+        while not self._cancel.is_set():
+            try:
+                self._queue.put(item, timeout=POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
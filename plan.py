@@ -0,0 +1,288 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from events import (
+    OP_BUTTON_PRESS,
+    OP_BUTTON_RELEASE,
+    OP_KEY_PRESS,
+    OP_KEY_RELEASE,
+    OP_MOVE,
+    OP_SCROLL,
+)
+
+NS_PER_SECOND = 1_000_000_000
+
+
+class PlaybackPlan:
+    def __init__(self) -> None:
+        self.offsets = array("q")
+        self.opcodes = array("b")
+        self.xs = array("i")
+        self.ys = array("i")
+        self.dxs = array("i")
+        self.dys = array("i")
+        self.targets = []
+        self.source_duration_ns = None
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    @property
+    def duration_ns(self) -> int:
+        if not self.offsets:
+            return 0
+        return self.offsets[-1]
+
+    def append(self, offset_ns, opcode, x=0, y=0, dx=0, dy=0, target=None) -> None:
+        self.offsets.append(offset_ns)
+        self.opcodes.append(opcode)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.dxs.append(dx)
+        self.dys.append(dy)
+        self.targets.append(target)
+
+    def extend(self, other: "PlaybackPlan") -> None:
+        self.offsets.extend(other.offsets)
+        self.opcodes.extend(other.opcodes)
+        self.xs.extend(other.xs)
+        self.ys.extend(other.ys)
+        self.dxs.extend(other.dxs)
+        self.dys.extend(other.dys)
+        self.targets.extend(other.targets)
+
+
+class Schedule:
+    def __init__(self) -> None:
+        self.entries = []
+        self.end_ns = 0
+        self.source_duration_ns = None
+
+    def __len__(self) -> int:
+        return sum(len(plan) for _offset, plan in self.entries)
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns
+
+    def plans(self):
+        unique = {}
+        for _offset, plan in self.entries:
+            unique.setdefault(id(plan), plan)
+        return list(unique.values())
+
+    def add(self, offset_ns: int, item) -> None:
+        if isinstance(item, Schedule):
+            for child_offset, plan in item.entries:
+                self.entries.append((offset_ns + child_offset, plan))
+        else:
+            self.entries.append((offset_ns, item))
+        self.end_ns = max(self.end_ns, offset_ns + item.duration_ns)
+
+    def retimed(self, speed=1.0, idle_threshold=None, idle_cap=None, idle_only_released=False):
+        retimed = {}
+        result = Schedule()
+        for offset, plan in self.entries:
+            key = id(plan)
+            if key not in retimed:
+                retimed[key] = retime_plan(
+                    plan, speed, idle_threshold, idle_cap, idle_only_released
+                )
+            result.add(int(offset / speed), retimed[key])
+        result.source_duration_ns = self.duration_ns
+        return result
+
+    def flatten(self) -> PlaybackPlan:
+        result = PlaybackPlan()
+        for offset, plan in sorted(self.entries, key=lambda entry: entry[0]):
+            shifted = PlaybackPlan()
+            shifted.offsets = array("q", [offset + value for value in plan.offsets])
+            shifted.opcodes = plan.opcodes
+            shifted.xs = plan.xs
+            shifted.ys = plan.ys
+            shifted.dxs = plan.dxs
+            shifted.dys = plan.dys
+            shifted.targets = plan.targets
+            result.extend(shifted)
+        return result
+
+
+def slice_plan(plan: PlaybackPlan, start_ns=None, end_ns=None) -> PlaybackPlan:
+    first = bisect_left(plan.offsets, start_ns) if start_ns is not None else 0
+    last = bisect_right(plan.offsets, end_ns) if end_ns is not None else len(plan)
+    base = start_ns if start_ns is not None else 0
+    result = PlaybackPlan()
+    result.offsets = array("q", [offset - base for offset in plan.offsets[first:last]])
+    result.opcodes = plan.opcodes[first:last]
+    result.xs = plan.xs[first:last]
+    result.ys = plan.ys[first:last]
+    result.dxs = plan.dxs[first:last]
+    result.dys = plan.dys[first:last]
+    result.targets = plan.targets[first:last]
+    return result
+
+
+def seconds_to_ns(value) -> int:
+    return int(round(float(value) * NS_PER_SECOND))
+
+
+def compile_plan(events, resolve_button=None, resolve_key=None) -> PlaybackPlan:
+    if resolve_button is None or resolve_key is None:
+        from models import deserialize_button, deserialize_key
+
+        resolve_button = resolve_button or deserialize_button
+        resolve_key = resolve_key or deserialize_key
+    plan = PlaybackPlan()
+    buttons = {}
+    keys = {}
+    for event in events:
+        offset = seconds_to_ns(event.get("t", 0.0))
+        event_type = event.get("type")
+        x = int(event.get("x", 0))
+        y = int(event.get("y", 0))
+        if event_type == "mouse_move":
+            plan.append(offset, OP_MOVE, x, y)
+        elif event_type == "mouse_click":
+            name = event.get("button")
+            if name not in buttons:
+                buttons[name] = resolve_button(name)
+            button = buttons[name]
+            if button is None:
+                continue
+            opcode = OP_BUTTON_PRESS if event.get("pressed") else OP_BUTTON_RELEASE
+            plan.append(offset, opcode, x, y, target=button)
+        elif event_type == "mouse_scroll":
+            plan.append(
+                offset,
+                OP_SCROLL,
+                x,
+                y,
+                int(event.get("dx", 0)),
+                int(event.get("dy", 0)),
+            )
+        elif event_type == "key":
+            action = event.get("action")
+            if action == "press":
+                opcode = OP_KEY_PRESS
+            elif action == "release":
+                opcode = OP_KEY_RELEASE
+            else:
+                continue
+            name = event.get("key")
+            if name not in keys:
+                keys[name] = resolve_key(name)
+            key_value = keys[name]
+            if key_value is None:
+                continue
+            plan.append(offset, opcode, target=key_value)
+    return plan
+
+
+class Retimer:
+    def __init__(self, speed=1.0, idle_threshold=None, idle_cap=None, idle_only_released=False):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.speed = speed
+        self.threshold_ns = seconds_to_ns(idle_threshold) if idle_threshold is not None else None
+        self.cap_ns = seconds_to_ns(idle_cap) if idle_cap is not None else self.threshold_ns
+        self.idle_only_released = idle_only_released
+        self._held = set()
+        self._previous = 0
+        self._elapsed = 0
+
+    def apply(self, plan: PlaybackPlan) -> PlaybackPlan:
+        result = PlaybackPlan()
+        result.opcodes = plan.opcodes
+        result.xs = plan.xs
+        result.ys = plan.ys
+        result.dxs = plan.dxs
+        result.dys = plan.dys
+        result.targets = plan.targets
+        threshold_ns = self.threshold_ns
+        held = self._held
+        previous = self._previous
+        elapsed = self._elapsed
+        for offset, opcode, target in zip(plan.offsets, plan.opcodes, plan.targets):
+            gap = offset - previous
+            previous = offset
+            if threshold_ns is not None and gap > threshold_ns:
+                if not (self.idle_only_released and held):
+                    gap = min(gap, self.cap_ns)
+            elapsed += gap
+            result.offsets.append(int(elapsed / self.speed))
+            if opcode == OP_BUTTON_PRESS:
+                held.add((OP_BUTTON_PRESS, target))
+            elif opcode == OP_KEY_PRESS:
+                held.add((OP_KEY_PRESS, target))
+            elif opcode == OP_BUTTON_RELEASE:
+                held.discard((OP_BUTTON_PRESS, target))
+            elif opcode == OP_KEY_RELEASE:
+                held.discard((OP_KEY_PRESS, target))
+        self._previous = previous
+        self._elapsed = elapsed
+        return result
+
+
+def retime_plan(
+    plan: PlaybackPlan,
+    speed=1.0,
+    idle_threshold=None,
+    idle_cap=None,
+    idle_only_released=False,
+) -> PlaybackPlan:
+    result = Retimer(speed, idle_threshold, idle_cap, idle_only_released).apply(plan)
+    result.source_duration_ns = plan.duration_ns
+    return result
+
+
+def duration_report(plan: PlaybackPlan) -> dict:
+    effective = plan.duration_ns
+    original = plan.source_duration_ns if plan.source_duration_ns is not None else effective
+    return {
+        "original_seconds": original / NS_PER_SECOND,
+        "effective_seconds": effective / NS_PER_SECOND,
+        "speedup": original / effective if effective else 1.0,
+    }
+
+
+def compile_columns(columns, resolve_button=None, resolve_key=None) -> PlaybackPlan:
+    import numpy as np
+
+    if resolve_button is None or resolve_key is None:
+        from models import deserialize_button, deserialize_key
+
+        resolve_button = resolve_button or deserialize_button
+        resolve_key = resolve_key or deserialize_key
+    opcodes = columns.opcodes
+    is_button = (opcodes == OP_BUTTON_PRESS) | (opcodes == OP_BUTTON_RELEASE)
+    is_key = (opcodes == OP_KEY_PRESS) | (opcodes == OP_KEY_RELEASE)
+    targets = np.full(len(opcodes), None, dtype=object)
+    keep = np.ones(len(opcodes), dtype=bool)
+    for mask, resolve in ((is_button, resolve_button), (is_key, resolve_key)):
+        codes = columns.labels[mask]
+        if not len(codes):
+            continue
+        unique, inverse = np.unique(codes, return_inverse=True)
+        resolved = np.empty(len(unique), dtype=object)
+        resolved[:] = [resolve(columns.names[code]) for code in unique.tolist()]
+        missing = np.array([value is None for value in resolved], dtype=bool)
+        targets[mask] = resolved[inverse]
+        keep[np.nonzero(mask)[0][missing[inverse]]] = False
+    is_scroll = opcodes == OP_SCROLL
+    xs = np.where(is_key, 0, columns.xs)[keep]
+    ys = np.where(is_key, 0, columns.ys)[keep]
+    dxs = np.where(is_scroll, columns.dxs, 0)[keep]
+    dys = np.where(is_scroll, columns.dys, 0)[keep]
+    limits = np.iinfo(np.int32)
+    for values in (xs, ys, dxs, dys):
+        if len(values) and (values.min() < limits.min or values.max() > limits.max):
+            raise OverflowError("coordinate out of range for a playback plan")
+    plan = PlaybackPlan()
+    plan.offsets.frombytes(np.rint(columns.t[keep] * NS_PER_SECOND).astype(np.int64).tobytes())
+    plan.opcodes.frombytes(opcodes[keep].astype(np.int8).tobytes())
+    plan.xs.frombytes(xs.astype(np.int32).tobytes())
+    plan.ys.frombytes(ys.astype(np.int32).tobytes())
+    plan.dxs.frombytes(dxs.astype(np.int32).tobytes())
+    plan.dys.frombytes(dys.astype(np.int32).tobytes())
+    plan.targets = targets[keep].tolist()
+    return plan
@@ -1,105 +1,399 @@
-import time
 import threading
-from pynput import mouse, keyboard
+from array import array
 
-from models import deserialize_button, deserialize_key
+from events import (
+    OP_BUTTON_PRESS,
+    OP_BUTTON_RELEASE,
+    OP_KEY_PRESS,
+    OP_KEY_RELEASE,
+    OP_MOVE,
+    OP_SCROLL,
+)
+from backends import PynputBackend
+from constants import CATCH_UP_COALESCE, CATCH_UP_MODES, CATCH_UP_SKIP, CATCH_UP_STRICT
+from pipeline import PlanLoader
+from plan import (
+    PlaybackPlan,
+    Retimer,
+    Schedule,
+    compile_columns,
+    compile_plan,
+    duration_report,
+    retime_plan,
+    seconds_to_ns,
+)
+from seek import SeekIndex
+from timing import HybridScheduler, summarize_lateness
+
+
+POSITIONED_OPCODES = (OP_BUTTON_PRESS, OP_BUTTON_RELEASE, OP_SCROLL)
+
+
+def catch_up_index(plan: PlaybackPlan, index: int, due_ns: int, policy: str) -> int:
+    offsets = plan.offsets
+    opcodes = plan.opcodes
+    count = len(plan)
+    last = index
+    while last + 1 < count and opcodes[last + 1] == OP_MOVE and offsets[last + 1] <= due_ns:
+        last += 1
+    following = last + 1
+    if (
+        policy == CATCH_UP_SKIP
+        and following < count
+        and offsets[following] <= due_ns
+        and opcodes[following] in POSITIONED_OPCODES
+    ):
+        return following
+    return last
 
 
 class Player:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        scheduler=None,
+        backend=None,
+        catch_up=CATCH_UP_COALESCE,
+        kill_switch=True,
+        profiler=None,
+    ) -> None:
+        if catch_up not in CATCH_UP_MODES:
+            raise ValueError(f"unknown catch-up policy: {catch_up!r}")
+        self.catch_up = catch_up
+        self.kill_switch = kill_switch
+        self.profiler = profiler
         self.is_playing = False
+        self.is_paused = False
+        self._stopped = False
+        self.stop_count = 0
+        self._armed = None
+        self._paused_ns = 0
         self._stop_event = threading.Event()
-        self._esc_listener = None
-        self._mouse = mouse.Controller()
-        self._keyboard = keyboard.Controller()
+        self._resume_event = threading.Event()
+        self._scheduler = scheduler if scheduler is not None else HybridScheduler()
+        self._backend = backend if backend is not None else PynputBackend()
+        self._lateness = array("q")
+        self._coalesced = 0
+        self._plan_report = None
+        self._play_started_ns = None
+        self._first_event_ns = None
+        self._current_plan = None
+        self._pass = 0
+        self._pass_started_ns = 0
+        self._pass_base = 0
+        self._deadline_ns = None
+        self._expired = False
+        self._period_ns = 0
+        self._gap_ns = 0
+        self._drift = array("q")
 
     def stop(self) -> None:
+        self.stop_count += 1
+        self._stopped = True
         self._stop_event.set()
+        self._resume_event.set()
+
+    def pause(self) -> None:
+        if self.is_playing and not self._stopped:
+            self._resume_event.clear()
+            self.is_paused = True
+            self._stop_event.set()
+
+    def resume(self) -> None:
+        self._resume_event.set()
+
+    def arm(self, stop_count: int) -> None:
+        self._armed = stop_count
+
+    def compile(self, events) -> PlaybackPlan:
+        return compile_plan(events, self._backend.resolve_button, self._backend.resolve_key)
+
+    def compile_columns(self, columns) -> PlaybackPlan:
+        return compile_columns(columns, self._backend.resolve_button, self._backend.resolve_key)
+
+    def compile_index(self, raw) -> SeekIndex:
+        return SeekIndex.from_dict(raw, self._backend.resolve_button, self._backend.resolve_key)
+
+    def timing_stats(self) -> dict:
+        stats = summarize_lateness(self._lateness)
+        stats["coalesced"] = self._coalesced
+        stats["first_event_ns"] = (
+            self._first_event_ns - self._play_started_ns
+            if self._first_event_ns is not None
+            else None
+        )
+        return stats
+
+    def plan_report(self):
+        return self._plan_report
 
-    def play(self, events, mode="once", repeat_count=1, loop_seconds=0):
+    def drift_report(self):
+        drift = self._drift
+        if not drift:
+            return None
+        return {
+            "passes": len(drift),
+            "period_ns": self._period_ns,
+            "gap_ns": self._gap_ns,
+            "drift_ns": drift[-1],
+            "max_drift_ns": max(drift),
+            "mean_drift_ns": sum(drift) // len(drift),
+        }
+
+    def telemetry(self) -> dict:
+        plan = self._current_plan
+        lateness = self._lateness
+        playing = self.is_playing and plan is not None
+        return {
+            "playing": playing,
+            "pass": self._pass,
+            "position": len(lateness) + self._coalesced - self._pass_base,
+            "events": len(plan) if plan is not None else 0,
+            "elapsed_ns": self._scheduler.now_ns() - self._pass_started_ns if playing else 0,
+            "planned_ns": plan.duration_ns if plan is not None else 0,
+            "lateness_ns": lateness[-1] if lateness else 0,
+        }
+
+    def play(
+        self,
+        events,
+        mode="once",
+        repeat_count=1,
+        loop_seconds=0,
+        speed=1.0,
+        idle_threshold=None,
+        idle_cap=None,
+        idle_only_released=False,
+        gap_seconds=0.0,
+    ):
         if self.is_playing:
             return
-        self.is_playing = True
-        self._stop_event.clear()
-        self._start_kill_switch()
+        self._begin()
         try:
-            if mode == "repeat":
-                for _ in range(max(1, repeat_count)):
-                    if self._stop_event.is_set():
-                        break
-                    self._play_sequence(events)
-            elif mode == "loop":
-                end_time = time.monotonic() + max(0.0, loop_seconds)
-                while time.monotonic() < end_time:
-                    if self._stop_event.is_set():
-                        break
-                    self._play_sequence(events)
+            if isinstance(events, (PlaybackPlan, Schedule)):
+                plan = events
             else:
-                self._play_sequence(events)
+                plan = self.compile(events)
+            if speed != 1.0 or idle_threshold is not None:
+                if isinstance(plan, Schedule):
+                    plan = plan.retimed(speed, idle_threshold, idle_cap, idle_only_released)
+                else:
+                    plan = retime_plan(plan, speed, idle_threshold, idle_cap, idle_only_released)
+            self._plan_report = duration_report(plan)
+            self._run(plan, None, mode, repeat_count, loop_seconds, gap_seconds)
         finally:
-            self.is_playing = False
-            self._stop_event.set()
-            self._stop_kill_switch()
+            self._finish()
 
-    def _start_kill_switch(self) -> None:
-        def on_press(key):
-            if key == keyboard.Key.esc:
-                self._stop_event.set()
+    def play_stream(
+        self,
+        events,
+        mode="once",
+        repeat_count=1,
+        loop_seconds=0,
+        speed=1.0,
+        idle_threshold=None,
+        idle_cap=None,
+        idle_only_released=False,
+        gap_seconds=0.0,
+    ):
+        if self.is_playing:
+            return None
+        self._begin()
+        loader = PlanLoader(events, self._backend.resolve_button, self._backend.resolve_key)
+        source = PlaybackPlan()
+        plan = source
+        retimer = None
+        if speed != 1.0 or idle_threshold is not None:
+            retimer = Retimer(speed, idle_threshold, idle_cap, idle_only_released)
+            plan = PlaybackPlan()
+
+        def fill() -> bool:
+            chunk = loader.next_chunk(self._stop_event)
+            if chunk is None:
                 return False
+            if retimer is not None:
+                source.extend(chunk)
+                chunk = retimer.apply(chunk)
+            plan.extend(chunk)
             return True
 
-        self._esc_listener = keyboard.Listener(on_press=on_press)
-        self._esc_listener.start()
+        try:
+            loader.start()
+            self._run(plan, fill, mode, repeat_count, loop_seconds, gap_seconds)
+        finally:
+            loader.close()
+            if retimer is not None:
+                plan.source_duration_ns = source.duration_ns
+            self._plan_report = duration_report(plan)
+            self._finish()
+        return source if loader.exhausted else None
 
-    def _stop_kill_switch(self) -> None:
-        if self._esc_listener is not None:
-            self._esc_listener.stop()
-            self._esc_listener = None
+    def _begin(self) -> None:
+        self.is_playing = True
+        self.is_paused = False
+        self._stopped = False
+        self._paused_ns = 0
+        self._resume_event.set()
+        self._stop_event.clear()
+        self._lateness = array("q")
+        self._coalesced = 0
+        self._first_event_ns = None
+        self._current_plan = None
+        self._pass = 0
+        self._deadline_ns = None
+        self._expired = False
+        self._period_ns = 0
+        self._gap_ns = 0
+        self._drift = array("q")
+        self._play_started_ns = self._scheduler.now_ns()
+        armed = self._armed
+        self._armed = None
+        if armed is not None and armed != self.stop_count:
+            self._stopped = True
+            self._stop_event.set()
+        self._start_kill_switch()
 
-    def _play_sequence(self, events) -> None:
-        if not events:
-            return
-        start_time = time.monotonic()
-        for event in events:
-            if self._stop_event.is_set():
+    def _finish(self) -> None:
+        self.is_playing = False
+        self.is_paused = False
+        self._stop_event.set()
+        self._stop_kill_switch()
+
+    def _run(self, plan, fill, mode, repeat_count, loop_seconds, gap_seconds=0.0) -> None:
+        passes = None
+        if mode == "repeat":
+            passes = max(1, repeat_count)
+        elif mode != "loop":
+            passes = 1
+        self._gap_ns = seconds_to_ns(max(0.0, gap_seconds))
+        start_ns = self._scheduler.now_ns()
+        if passes is None:
+            self._deadline_ns = start_ns + seconds_to_ns(max(0.0, loop_seconds))
+        while passes is None or self._pass < passes:
+            if self._interrupted() or self._expired:
                 break
-            target_time = start_time + float(event.get("t", 0.0))
-            self._sleep_until(target_time)
-            if self._stop_event.is_set():
+            if passes is None and self._scheduler.now_ns() >= self._deadline_ns + self._paused_ns:
+                break
+            self._play_pass(plan, fill, start_ns + self._paused_ns)
+            fill = None
+            self._period_ns = plan.duration_ns
+            start_ns += self._period_ns + self._gap_ns
+
+    def _play_pass(self, plan, fill, start_ns) -> None:
+        self._pass_base = len(self._lateness) + self._coalesced
+        self._pass_started_ns = start_ns
+        self._current_plan = plan
+        self._pass += 1
+        if isinstance(plan, Schedule):
+            self._play_schedule(plan, start_ns)
+        else:
+            self._play_sequence(plan, fill, start_ns)
+
+    def _play_schedule(self, schedule: Schedule, start_ns) -> None:
+        start_ns -= self._paused_ns
+        for offset, plan in schedule.entries:
+            if self._interrupted() or self._expired:
                 break
-            self._dispatch_event(event)
+            self._play_sequence(plan, start_ns=start_ns + self._paused_ns + offset)
 
-    def _sleep_until(self, target_time: float) -> None:
+    def _interrupted(self) -> bool:
+        return self._stop_event.is_set() and self._wait_while_paused() is None
+
+    def _wait_while_paused(self):
+        if self._stopped or not self.is_paused:
+            return None
+        started_ns = self._scheduler.now_ns()
+        self._resume_event.wait()
+        if self._stopped:
+            return None
+        self.is_paused = False
+        self._stop_event.clear()
+        paused_ns = self._scheduler.now_ns() - started_ns
+        self._paused_ns += paused_ns
+        return paused_ns
+
+    def _start_kill_switch(self) -> None:
+        if self.kill_switch:
+            self._backend.start_kill_switch(self.stop)
+
+    def _stop_kill_switch(self) -> None:
+        if self.kill_switch:
+            self._backend.stop_kill_switch()
+
+    def _play_sequence(self, plan: PlaybackPlan, fill=None, start_ns=None) -> None:
+        offsets = plan.offsets
+        opcodes = plan.opcodes
+        lateness = self._lateness
+        catch_up = self.catch_up != CATCH_UP_STRICT
+        first = len(self._drift) < self._pass
+        profiler = self.profiler
+        now = self._scheduler.now_ns
+        if start_ns is None:
+            start_ns = now()
+        deadline_ns = self._deadline_ns
+        if deadline_ns is not None:
+            deadline_ns += self._paused_ns
+        index = 0
+        count = len(plan)
         while True:
+            if index >= count:
+                if fill is not None and fill():
+                    count = len(plan)
+                    continue
+                if not self._stop_event.is_set():
+                    break
+            if self._stop_event.is_set():
+                paused_ns = self._wait_while_paused()
+                if paused_ns is None:
+                    break
+                start_ns += paused_ns
+                if deadline_ns is not None:
+                    deadline_ns += paused_ns
+                continue
+            target_ns = start_ns + offsets[index]
+            if deadline_ns is not None and target_ns > deadline_ns:
+                self._expired = True
+                break
+            now_ns = self._sleep_until(target_ns)
             if self._stop_event.is_set():
-                return
-            remaining = target_time - time.monotonic()
-            if remaining <= 0:
-                return
-            time.sleep(min(remaining, 0.01))
-
-    def _dispatch_event(self, event: dict) -> None:
-        event_type = event.get("type")
-        if event_type == "mouse_click":
-            button = deserialize_button(event.get("button"))
-            if button is None:
-                return
-            self._mouse.position = (event.get("x", 0), event.get("y", 0))
-            if event.get("pressed"):
-                self._mouse.press(button)
+                continue
+            slept_ns = target_ns
+            if catch_up and opcodes[index] == OP_MOVE:
+                index = self._catch_up(plan, index, start_ns, now_ns)
+                target_ns = start_ns + offsets[index]
+            lateness.append(now_ns - target_ns)
+            if profiler is None:
+                self._dispatch(plan, index)
             else:
-                self._mouse.release(button)
-        elif event_type == "mouse_move":
-            self._mouse.position = (event.get("x", 0), event.get("y", 0))
-        elif event_type == "mouse_scroll":
-            self._mouse.position = (event.get("x", 0), event.get("y", 0))
-            self._mouse.scroll(event.get("dx", 0), event.get("dy", 0))
-        elif event_type == "key":
-            key_value = deserialize_key(event.get("key"))
-            if key_value is None:
-                return
-            action = event.get("action")
-            if action == "press":
-                self._keyboard.press(key_value)
-            elif action == "release":
-                self._keyboard.release(key_value)
+                dispatch_ns = now()
+                self._dispatch(plan, index)
+                profiler.record(opcodes[index], target_ns, slept_ns, now_ns, dispatch_ns, now())
+            if first:
+                if self._first_event_ns is None:
+                    self._first_event_ns = now_ns
+                self._drift.append(now_ns - target_ns)
+                first = False
+            index += 1
+
+    def _catch_up(self, plan: PlaybackPlan, index: int, start_ns: int, now_ns: int) -> int:
+        caught_up = catch_up_index(plan, index, now_ns - start_ns, self.catch_up)
+        self._coalesced += caught_up - index
+        return caught_up
+
+    def _sleep_until(self, target_ns: int) -> int:
+        return self._scheduler.sleep_until(target_ns, self._stop_event)
+
+    def _dispatch(self, plan: PlaybackPlan, index: int) -> None:
+        opcode = plan.opcodes[index]
+        backend = self._backend
+        if opcode == OP_MOVE:
+            backend.move(plan.xs[index], plan.ys[index])
+        elif opcode == OP_BUTTON_PRESS:
+            backend.press_button(plan.xs[index], plan.ys[index], plan.targets[index])
+        elif opcode == OP_BUTTON_RELEASE:
+            backend.release_button(plan.xs[index], plan.ys[index], plan.targets[index])
+        elif opcode == OP_SCROLL:
+            backend.scroll(plan.xs[index], plan.ys[index], plan.dxs[index], plan.dys[index])
+        elif opcode == OP_KEY_PRESS:
+            backend.press_key(plan.targets[index])
+        elif opcode == OP_KEY_RELEASE:
+            backend.release_key(plan.targets[index])
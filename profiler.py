@@ -0,0 +1,159 @@
+import json
+from array import array
+from pathlib import Path
+
+from constants import PROFILE_TRACE_EVENTS
+from events import (
+    OP_BUTTON_PRESS,
+    OP_BUTTON_RELEASE,
+    OP_KEY_PRESS,
+    OP_KEY_RELEASE,
+    OP_MOVE,
+    OP_SCROLL,
+)
+
+OPCODE_NAMES = {
+    OP_MOVE: "move",
+    OP_BUTTON_PRESS: "button_press",
+    OP_BUTTON_RELEASE: "button_release",
+    OP_SCROLL: "scroll",
+    OP_KEY_PRESS: "key_press",
+    OP_KEY_RELEASE: "key_release",
+}
+SUB_BITS = 3
+BUCKETS = 64 << SUB_BITS
+SAMPLE_FIELDS = 6
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self.buckets = array("q", bytes(8 * BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value_ns: int) -> None:
+        if value_ns < 0:
+            value_ns = 0
+        shift = value_ns.bit_length() - SUB_BITS - 1
+        if shift < 0:
+            shift = 0
+        self.buckets[(shift << SUB_BITS) + (value_ns >> shift)] += 1
+        self.count += 1
+        self.total += value_ns
+        if value_ns > self.max:
+            self.max = value_ns
+
+    def percentile(self, fraction: float) -> int:
+        if not self.count:
+            return 0
+        rank = max(1, int(self.count * fraction + 0.5))
+        seen = 0
+        for bucket, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= rank:
+                shift = max(0, (bucket >> SUB_BITS) - 1)
+                upper = ((bucket - (shift << SUB_BITS) + 1) << shift) - 1
+                return min(self.max, upper)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ns": self.total // self.count if self.count else 0,
+            "p50_ns": self.percentile(0.5),
+            "p99_ns": self.percentile(0.99),
+            "max_ns": self.max,
+        }
+
+
+class PlaybackProfiler:
+    def __init__(self, max_trace_events=PROFILE_TRACE_EVENTS) -> None:
+        self.max_trace_events = max(0, int(max_trace_events))
+        self.wake_error = Histogram()
+        self.latency = {opcode: Histogram() for opcode in OPCODE_NAMES}
+        self.backend = {opcode: Histogram() for opcode in OPCODE_NAMES}
+        self._samples = array("q")
+        self._limit = self.max_trace_events * SAMPLE_FIELDS
+        self._summarized = 0
+
+    def __len__(self) -> int:
+        return len(self._samples) // SAMPLE_FIELDS
+
+    def record(self, opcode, target_ns, slept_ns, wake_ns, start_ns, end_ns) -> None:
+        if len(self._samples) < self._limit:
+            self._samples.extend((opcode, target_ns, slept_ns, wake_ns, start_ns, end_ns))
+        else:
+            self._add(opcode, target_ns, slept_ns, wake_ns, start_ns, end_ns)
+
+    def _add(self, opcode, target_ns, slept_ns, wake_ns, start_ns, end_ns) -> None:
+        self.wake_error.add(wake_ns - slept_ns)
+        self.latency[opcode].add(end_ns - target_ns)
+        self.backend[opcode].add(end_ns - start_ns)
+
+    def _summarize(self) -> None:
+        samples = self._samples
+        for offset in range(self._summarized, len(samples), SAMPLE_FIELDS):
+            self._add(*samples[offset : offset + SAMPLE_FIELDS])
+        self._summarized = len(samples)
+
+    def report(self) -> dict:
+        self._summarize()
+        return {
+            "wake_error": self.wake_error.summary(),
+            "events": {
+                OPCODE_NAMES[opcode]: {
+                    "dispatch_latency": self.latency[opcode].summary(),
+                    "backend_call": self.backend[opcode].summary(),
+                }
+                for opcode in OPCODE_NAMES
+                if self.latency[opcode].count
+            },
+            "traced": len(self),
+            "untraced": self.wake_error.count - len(self),
+        }
+
+    def trace(self) -> dict:
+        events = [
+            {"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "playback"}},
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "sleep"}},
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": 2, "args": {"name": "dispatch"}},
+        ]
+        samples = self._samples
+        origin = samples[2] if samples else 0
+        for offset in range(0, len(samples), SAMPLE_FIELDS):
+            opcode, target_ns, slept_ns, wake_ns, start_ns, end_ns = samples[
+                offset : offset + SAMPLE_FIELDS
+            ]
+            if wake_ns > slept_ns:
+                events.append(
+                    {
+                        "name": "wake error",
+                        "cat": "scheduler",
+                        "ph": "X",
+                        "pid": 1,
+                        "tid": 1,
+                        "ts": (slept_ns - origin) / 1000,
+                        "dur": (wake_ns - slept_ns) / 1000,
+                    }
+                )
+            events.append(
+                {
+                    "name": OPCODE_NAMES[opcode],
+                    "cat": "dispatch",
+                    "ph": "X",
+                    "pid": 1,
+                    "tid": 2,
+                    "ts": (start_ns - origin) / 1000,
+                    "dur": (end_ns - start_ns) / 1000,
+                    "args": {"late_ns": end_ns - target_ns},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ns"}
+
+    def write_trace(self, path: Path) -> int:
+        trace = self.trace()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as handle:
+            json.dump(trace, handle, separators=(",", ":"))
+        return len(trace["traceEvents"])
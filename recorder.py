@@ -1,26 +1,62 @@
 import time
-import threading
-from pynput import mouse, keyboard
 
-from constants import MOVE_MIN_DISTANCE, MOVE_MIN_INTERVAL
+from capture import CaptureStream, merge_streams
+from constants import (
+    JOURNAL_BATCH_SIZE,
+    JOURNAL_FLUSH_INTERVAL,
+    MOVE_MIN_DISTANCE,
+    MOVE_MIN_INTERVAL,
+)
+from events import (
+    OP_BUTTON_PRESS,
+    OP_BUTTON_RELEASE,
+    OP_KEY_PRESS,
+    OP_KEY_RELEASE,
+    OP_SCROLL,
+)
+from journal import JournalWriter
 from models import serialize_button, serialize_key
+from simplify import simplify_moves
+from storage import finalize_journal, recover_journal, save_macro
 
 
 class Recorder:
-    def __init__(self) -> None:
-        self._lock = threading.Lock()
+    def __init__(
+        self,
+        journal_batch_size=JOURNAL_BATCH_SIZE,
+        journal_flush_interval=JOURNAL_FLUSH_INTERVAL,
+        simplify_tolerance=None,
+    ) -> None:
+        self._simplify_tolerance = simplify_tolerance
+        self._journal_batch_size = journal_batch_size
+        self._journal_flush_interval = journal_flush_interval
+        self._journal = None
+        self.journal_path = None
         self._start_time = None
         self._mouse_listener = None
         self._keyboard_listener = None
-        self._events = []
+        self._mouse_stream = CaptureStream()
+        self._keyboard_stream = CaptureStream()
         self._last_move_time = None
         self._last_move_pos = None
         self.is_recording = False
 
-    def start(self) -> None:
+    def start(self, journal_path=None) -> None:
         if self.is_recording:
             return
-        self._events = []
+        from pynput import keyboard, mouse
+
+        self._mouse_stream = CaptureStream()
+        self._keyboard_stream = CaptureStream()
+        self.journal_path = journal_path
+        if journal_path is not None:
+            self._journal = JournalWriter(
+                journal_path,
+                (self._mouse_stream, self._keyboard_stream),
+                batch_size=self._journal_batch_size,
+                flush_interval=self._journal_flush_interval,
+            )
+            self._journal.start()
         self._start_time = time.monotonic()
         self._last_move_time = None
         self._last_move_pos = None
@@ -46,74 +82,86 @@ class Recorder:
             self._mouse_listener.stop()
         if self._keyboard_listener is not None:
             self._keyboard_listener.stop()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def event_count(self) -> int:
+        return len(self._mouse_stream) + len(self._keyboard_stream)
+
+    def telemetry(self) -> dict:
+        journal = self._journal
+        return {
+            "recording": self.is_recording,
+            "events": self.event_count(),
+            "elapsed_seconds": self._timestamp() if self.is_recording else 0.0,
+            "journaled": journal.written if journal is not None else 0,
+        }
 
     def get_events(self):
-        with self._lock:
-            return sorted(self._events, key=lambda item: item.get("t", 0.0))
+        if self.journal_path is not None:
+            events = recover_journal(self.journal_path)
+        else:
+            events = merge_streams((self._mouse_stream, self._keyboard_stream))
+        if self._simplify_tolerance is not None:
+            events, _ = simplify_moves(events, tolerance=self._simplify_tolerance)
+        return events
+
+    def save(self, path) -> int:
+        if self.journal_path is not None and self._simplify_tolerance is None:
+            return finalize_journal(self.journal_path, path)
+        events = self.get_events()
+        save_macro(events, path)
+        return len(events)
 
     def _timestamp(self) -> float:
         if self._start_time is None:
             return 0.0
         return time.monotonic() - self._start_time
 
-    def _append_event(self, event: dict) -> None:
-        with self._lock:
-            self._events.append(event)
-
     def _on_click(self, x, y, button, pressed):
-        event = {
-            "t": self._timestamp(),
-            "type": "mouse_click",
-            "x": int(x),
-            "y": int(y),
-            "button": serialize_button(button),
-            "pressed": bool(pressed),
-        }
-        self._append_event(event)
+        self._mouse_stream.append(
+            self._timestamp(),
+            OP_BUTTON_PRESS if pressed else OP_BUTTON_RELEASE,
+            int(x),
+            int(y),
+            label=serialize_button(button),
+        )
 
     def _on_move(self, x, y):
         timestamp = self._timestamp()
+        x_value = int(x)
+        y_value = int(y)
         if self._last_move_time is not None:
             elapsed = timestamp - self._last_move_time
             last_x, last_y = self._last_move_pos
-            distance = abs(int(x) - last_x) + abs(int(y) - last_y)
+            distance = abs(x_value - last_x) + abs(y_value - last_y)
             if elapsed < MOVE_MIN_INTERVAL and distance < MOVE_MIN_DISTANCE:
                 return
         self._last_move_time = timestamp
-        self._last_move_pos = (int(x), int(y))
-        event = {
-            "t": timestamp,
-            "type": "mouse_move",
-            "x": int(x),
-            "y": int(y),
-        }
-        self._append_event(event)
+        self._last_move_pos = (x_value, y_value)
+        self._mouse_stream.append_move(timestamp, x_value, y_value)
 
     def _on_scroll(self, x, y, dx, dy):
-        event = {
-            "t": self._timestamp(),
-            "type": "mouse_scroll",
-            "x": int(x),
-            "y": int(y),
-            "dx": int(dx),
-            "dy": int(dy),
-        }
-        self._append_event(event)
+        self._mouse_stream.append(
+            self._timestamp(),
+            OP_SCROLL,
+            int(x),
+            int(y),
+            int(dx),
+            int(dy),
+        )
 
     def _on_press(self, key):
-        event = {
-            "t": self._timestamp(),
-            "type": "key",
-            "action": "press",
-            "key": serialize_key(key),
-        }
-        self._append_event(event)
+        self._keyboard_stream.append(
+            self._timestamp(),
+            OP_KEY_PRESS,
+            label=serialize_key(key),
+        )
 
     def _on_release(self, key):
-        event = {
-            "t": self._timestamp(),
-            "type": "key",
-            "action": "release",
-            "key": serialize_key(key),
-        }
-        self._append_event(event)
+        self._keyboard_stream.append(
+            self._timestamp(),
+            OP_KEY_RELEASE,
+            label=serialize_key(key),
+        )
@@ -0,0 +1,156 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from constants import SEEK_CHECKPOINT_EVENTS
+from events import (
+    OP_BUTTON_PRESS,
+    OP_BUTTON_RELEASE,
+    OP_KEY_PRESS,
+    OP_KEY_RELEASE,
+    OP_MOVE,
+)
+from plan import PlaybackPlan, compile_plan, slice_plan
+
+INDEX_VERSION = 1
+
+
+class SeekIndex:
+    def __init__(self, every=SEEK_CHECKPOINT_EVENTS, times=None, states=None) -> None:
+        self.every = every
+        self.times = times if times is not None else array("q")
+        self.states = states if states is not None else []
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def state_at(self, plan: PlaybackPlan, offset_ns: int):
+        slot = bisect_right(self.times, offset_ns) - 1
+        if slot >= 0:
+            buttons, keys, position = self.states[slot]
+            buttons = dict.fromkeys(buttons)
+            keys = dict.fromkeys(keys)
+            begin = bisect_left(plan.offsets, self.times[slot])
+        else:
+            buttons = {}
+            keys = {}
+            position = None
+            begin = 0
+        end = bisect_left(plan.offsets, offset_ns)
+        position = _replay(plan, begin, end, buttons, keys, position)
+        return list(buttons), list(keys), position
+
+    def to_dict(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "every": self.every,
+            "checkpoints": [
+                [offset_ns, list(buttons), list(keys), list(position) if position else None]
+                for offset_ns, (buttons, keys, position) in zip(self.times, self.states)
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, raw, resolve_button, resolve_key) -> "SeekIndex":
+        if not isinstance(raw, dict) or raw.get("version") != INDEX_VERSION:
+            raise ValueError("unsupported seek index")
+        checkpoints = raw.get("checkpoints")
+        if not isinstance(checkpoints, list):
+            raise ValueError("seek index has no checkpoints")
+        index = cls(raw.get("every", SEEK_CHECKPOINT_EVENTS))
+        previous = None
+        try:
+            for offset_ns, buttons, keys, position in checkpoints:
+                if type(offset_ns) is not int or (previous is not None and offset_ns < previous):
+                    raise ValueError("seek index checkpoints are out of order")
+                previous = offset_ns
+                index.times.append(offset_ns)
+                index.states.append(
+                    (
+                        tuple(_resolve_all(buttons, resolve_button)),
+                        tuple(_resolve_all(keys, resolve_key)),
+                        (int(position[0]), int(position[1])) if position else None,
+                    )
+                )
+        except (TypeError, ValueError, IndexError, OverflowError) as exc:
+            raise ValueError(f"malformed seek index: {exc}") from exc
+        return index
+
+
+def build_index(plan: PlaybackPlan, every=SEEK_CHECKPOINT_EVENTS) -> SeekIndex:
+    every = max(1, int(every))
+    index = SeekIndex(every)
+    offsets = plan.offsets
+    buttons = {}
+    keys = {}
+    position = None
+    for begin in range(every, len(plan), every):
+        position = _replay(plan, begin - every, begin, buttons, keys, position)
+        index.times.append(offsets[begin])
+        index.states.append((tuple(buttons), tuple(keys), position))
+    return index
+
+
+def index_events(events, every=SEEK_CHECKPOINT_EVENTS):
+    plan = compile_plan(events, _name, _name)
+    offsets = plan.offsets
+    if any(offsets[i] > offsets[i + 1] for i in range(len(offsets) - 1)):
+        return None
+    return build_index(plan, every)
+
+
+def seek_plan(plan: PlaybackPlan, start_ns=None, end_ns=None, index=None) -> PlaybackPlan:
+    start_ns = max(0, start_ns) if start_ns is not None else 0
+    if index is None:
+        index = SeekIndex()
+    buttons, keys, position = index.state_at(plan, start_ns)
+    result = PlaybackPlan()
+    x, y = position if position is not None else (0, 0)
+    if position is not None:
+        result.append(0, OP_MOVE, x, y)
+    for button in buttons:
+        result.append(0, OP_BUTTON_PRESS, x, y, target=button)
+    for key in keys:
+        result.append(0, OP_KEY_PRESS, target=key)
+    section = slice_plan(plan, start_ns, end_ns)
+    result.extend(section)
+    if end_ns is not None:
+        held_buttons, held_keys, position = index.state_at(plan, end_ns + 1)
+        x, y = position if position is not None else (0, 0)
+        release_ns = result.duration_ns
+        for key in held_keys:
+            result.append(release_ns, OP_KEY_RELEASE, target=key)
+        for button in held_buttons:
+            result.append(release_ns, OP_BUTTON_RELEASE, x, y, target=button)
+    result.source_duration_ns = section.duration_ns
+    return result
+
+
+def _replay(plan, begin, end, buttons, keys, position):
+    opcodes = plan.opcodes
+    targets = plan.targets
+    xs = plan.xs
+    ys = plan.ys
+    for i in range(begin, end):
+        opcode = opcodes[i]
+        if opcode == OP_KEY_PRESS:
+            keys[targets[i]] = None
+        elif opcode == OP_KEY_RELEASE:
+            keys.pop(targets[i], None)
+        else:
+            position = (xs[i], ys[i])
+            if opcode == OP_BUTTON_PRESS:
+                buttons[targets[i]] = None
+            elif opcode == OP_BUTTON_RELEASE:
+                buttons.pop(targets[i], None)
+    return position
+
+
+def _resolve_all(names, resolve):
+    for name in names:
+        value = resolve(name)
+        if value is not None:
+            yield value
+
+
+def _name(value):
+    return value if isinstance(value, str) else None
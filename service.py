@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+import traceback
+
+from constants import CATCH_UP_COALESCE, HOTKEYS
+from player import Player
+
+
+class PlayJob:
+    def __init__(self, action, on_done=None) -> None:
+        self.action = action
+        self.on_done = on_done
+        self.submitted_ns = time.perf_counter_ns()
+        self.stop_count = None
+        self.started_ns = None
+        self.result = None
+        self.stats = None
+        self.error = None
+        self.cancelled = False
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def start_latency_ns(self):
+        if self.started_ns is None or self.stats is None:
+            return None
+        first_event_ns = self.stats.get("first_event_ns")
+        if first_event_ns is None:
+            return None
+        return self.started_ns - self.submitted_ns + first_event_ns
+
+    def wait(self, timeout=None) -> bool:
+        return self._done.wait(timeout)
+
+    def _finish(self) -> None:
+        self._done.set()
+        if self.on_done is not None:
+            self.on_done(self)
+
+
+class ControlService:
+    def __init__(self, backend=None, scheduler=None, catch_up=CATCH_UP_COALESCE, hotkeys=None):
+        if backend is None:
+            from backends import PynputBackend
+
+            backend = PynputBackend()
+        self.backend = backend
+        self.player = Player(scheduler, backend, catch_up, kill_switch=False)
+        self.hotkeys = dict(HOTKEYS if hotkeys is None else hotkeys)
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._thread = None
+        self._closed = False
+
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return self._pending > 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        actions = {"stop": self.stop, "pause": self.player.pause, "resume": self.player.resume}
+        bindings = {}
+        for name, key in self.hotkeys.items():
+            if name not in actions:
+                raise ValueError(f"unknown hotkey action: {name!r}")
+            bindings[key] = actions[name]
+        self.backend.start_hotkeys(bindings)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, action, on_done=None) -> PlayJob:
+        if self._closed:
+            raise RuntimeError("control service is closed")
+        self.start()
+        job = PlayJob(action, on_done)
+        job.stop_count = self.player.stop_count
+        with self._lock:
+            self._pending += 1
+        self._jobs.put(job)
+        return job
+
+    def play(self, source, on_done=None, **options) -> PlayJob:
+        return self.submit(lambda player: player.play(source, **options), on_done)
+
+    def play_stream(self, events, on_done=None, **options) -> PlayJob:
+        return self.submit(lambda player: player.play_stream(events, **options), on_done)
+
+    def stop(self) -> None:
+        self._cancel_queued()
+        self.player.stop()
+
+    def close(self, timeout=None) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.stop()
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+        self.backend.stop_hotkeys()
+
+    def _cancel_queued(self) -> None:
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is None:
+                self._jobs.put(None)
+                return
+            job.cancelled = True
+            self._complete(job)
+
+    def _complete(self, job: PlayJob) -> None:
+        with self._lock:
+            self._pending -= 1
+        job._finish()
+
+    def _run(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            if job.cancelled or job.stop_count != self.player.stop_count:
+                job.cancelled = True
+                self._complete(job)
+                continue
+            job.started_ns = time.perf_counter_ns()
+            self.player.arm(job.stop_count)
+            try:
+                job.result = job.action(self.player)
+                job.stats = self.player.timing_stats()
+            except Exception as exc:
+                job.error = exc
+                traceback.print_exc()
+            finally:
+                self._complete(job)
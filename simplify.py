@@ -0,0 +1,117 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from constants import SIMPLIFY_MAX_GAP, SIMPLIFY_TOLERANCE
+
+VECTOR_MIN_POINTS = 64
+
+
+def simplify_moves(events, tolerance=SIMPLIFY_TOLERANCE, max_gap=SIMPLIFY_MAX_GAP):
+    events = list(events)
+    keep = [True] * len(events)
+    moves_before = 0
+    for start, stop in _move_runs(events):
+        moves_before += stop - start
+        run = events[start:stop]
+        xs = [event["x"] for event in run]
+        ys = [event["y"] for event in run]
+        ts = [event["t"] for event in run]
+        mask = _rdp(xs, ys, tolerance)
+        if max_gap is not None and max_gap > 0:
+            _limit_gaps(mask, ts, max_gap)
+        for offset, kept in enumerate(mask):
+            keep[start + offset] = bool(kept)
+    simplified = [event for event, kept in zip(events, keep) if kept]
+    moves_after = moves_before - (len(events) - len(simplified))
+    report = {
+        "events_before": len(events),
+        "events_after": len(simplified),
+        "moves_before": moves_before,
+        "moves_after": moves_after,
+        "reduction": 1.0 - moves_after / moves_before if moves_before else 0.0,
+    }
+    return simplified, report
+
+
+def _move_runs(events):
+    start = None
+    for index, event in enumerate(events):
+        if event.get("type") == "mouse_move":
+            if start is None:
+                start = index
+        elif start is not None:
+            yield start, index
+            start = None
+    if start is not None:
+        yield start, len(events)
+
+
+def _rdp(xs, ys, tolerance):
+    keep = [False] * len(xs)
+    keep[0] = keep[-1] = True
+    if np is not None and len(xs) > VECTOR_MIN_POINTS:
+        x_array = np.asarray(xs, dtype=np.float64)
+        y_array = np.asarray(ys, dtype=np.float64)
+    else:
+        x_array = y_array = None
+    stack = [(0, len(xs) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        if x_array is not None and last - first > VECTOR_MIN_POINTS:
+            middle, worst = _farthest_numpy(x_array, y_array, first, last)
+        else:
+            middle, worst = _farthest_python(xs, ys, first, last)
+        if worst > tolerance:
+            keep[middle] = True
+            stack.append((first, middle))
+            stack.append((middle, last))
+    return keep
+
+
+def _farthest_numpy(xs, ys, first, last):
+    ax, ay = xs[first], ys[first]
+    vx, vy = xs[last] - ax, ys[last] - ay
+    px = xs[first + 1 : last] - ax
+    py = ys[first + 1 : last] - ay
+    length_sq = vx * vx + vy * vy
+    if length_sq == 0:
+        distances = np.hypot(px, py)
+    else:
+        along = np.clip((px * vx + py * vy) / length_sq, 0.0, 1.0)
+        distances = np.hypot(px - along * vx, py - along * vy)
+    index = int(np.argmax(distances))
+    return first + 1 + index, float(distances[index])
+
+
+def _farthest_python(xs, ys, first, last):
+    ax, ay = xs[first], ys[first]
+    vx, vy = xs[last] - ax, ys[last] - ay
+    length_sq = vx * vx + vy * vy
+    worst = -1.0
+    middle = first
+    for index in range(first + 1, last):
+        px, py = xs[index] - ax, ys[index] - ay
+        if length_sq == 0:
+            distance = (px * px + py * py) ** 0.5
+        else:
+            along = min(1.0, max(0.0, (px * vx + py * vy) / length_sq))
+            dx, dy = px - along * vx, py - along * vy
+            distance = (dx * dx + dy * dy) ** 0.5
+        if distance > worst:
+            worst = distance
+            middle = index
+    return middle, worst
+
+
+def _limit_gaps(mask, ts, max_gap) -> None:
+    previous = 0
+    for index in range(1, len(mask)):
+        if ts[index] - ts[previous] > max_gap and index - 1 > previous:
+            mask[index - 1] = True
+            previous = index - 1
+        if mask[index]:
+            previous = index
@@ -1,24 +1,180 @@
+import heapq
 import json
 from datetime import datetime
 from pathlib import Path
 
+from binformat import SUFFIX as BINARY_SUFFIX
+from binformat import BinaryMacro, is_binary_macro, read_binary, write_binary
+from chunkstore import SUFFIX as MANIFEST_SUFFIX
+from chunkstore import is_manifest, iter_manifest, read_manifest, write_manifest
+from constants import JOURNAL_REORDER_SECONDS, STREAM_REORDER_SECONDS
+from journal import iter_journal, read_journal_header
+from jsonstream import iter_array_items, read_field
+from macrocodec import (
+    codec_for_path,
+    is_delta,
+    open_output,
+    open_text,
+    read_payload,
+    write_payload,
+)
+from seek import index_events
 
-def save_macro(events, path: Path) -> None:
+
+def save_macro(events, path: Path, created=None, codec=None) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
+    if created is None:
+        created = datetime.now().isoformat(timespec="seconds")
+    if path.suffix == BINARY_SUFFIX:
+        write_binary(_validate_events(list(events)), path, created)
+        return
+    if path.suffix == MANIFEST_SUFFIX:
+        write_manifest(_validate_events(list(events)), path, created)
+        return
+    codec = codec or codec_for_path(path)
+    events = list(events)
+    if codec.startswith("delta"):
+        events = _validate_events(events)
     payload = {
         "version": 1,
-        "created": datetime.now().isoformat(timespec="seconds"),
-        "events": list(events),
+        "created": created,
     }
-    with path.open("w", encoding="utf-8") as handle:
-        json.dump(payload, handle, indent=2)
+    index = index_events(events)
+    if index is not None and len(index):
+        payload["index"] = index.to_dict()
+    payload["events"] = events
+    write_payload(payload, path, codec)
+
+
+def load_seek_index(path: Path):
+    if is_binary_macro(path) or is_manifest(path):
+        return None
+    try:
+        with open_text(path) as handle:
+            return read_field(handle, "index", until="events")
+    except (OSError, EOFError, ValueError) as exc:
+        raise ValueError(f"{path} has an unreadable seek index: {exc}") from exc
 
 
 def load_macro(path: Path):
-    with path.open("r", encoding="utf-8") as handle:
-        payload = json.load(handle)
+    return _read_macro(path)[1]
+
+
+def iter_macro(path: Path, reorder_seconds=STREAM_REORDER_SECONDS):
+    if is_binary_macro(path):
+        with BinaryMacro(path) as macro:
+            yield from macro
+        return
+    if is_manifest(path):
+        yield from _reorder(map(_validate_event, iter_manifest(path)), reorder_seconds)
+        return
+    if is_delta(path):
+        yield from _read_macro(path)[1]
+        return
+    with open_text(path) as handle:
+        raw_events = iter_array_items(handle, "events")
+        yield from _reorder(map(_validate_event, raw_events), reorder_seconds)
+
+
+def load_columns(path: Path):
+    from columns import ColumnarFallback, columns_from_binary, columns_from_events
+    from columns import validate_columns
+
+    if is_binary_macro(path):
+        with BinaryMacro(path) as macro:
+            return columns_from_binary(macro)
+    if is_manifest(path):
+        return columns_from_events(_read_macro(path)[1])
+    payload = read_payload(path)
+    raw_events = payload.get("events", []) if isinstance(payload, dict) else []
+    if not isinstance(raw_events, list):
+        raw_events = []
+    try:
+        return validate_columns(raw_events)
+    except ColumnarFallback:
+        return columns_from_events(_validate_events(raw_events))
+
+
+def convert_macro(source: Path, destination: Path, codec=None) -> int:
+    created, events = _read_macro(source)
+    save_macro(events, destination, created=created, codec=codec)
+    return len(events)
+
+
+def check_macro(path: Path):
+    if is_binary_macro(path):
+        with BinaryMacro(path) as macro:
+            return len(macro), len(macro)
+    if is_manifest(path):
+        raw_events = list(iter_manifest(path))
+        return len(raw_events), len(_validate_events(raw_events))
+    payload = read_payload(path)
+    raw_events = payload.get("events", []) if isinstance(payload, dict) else []
+    total = len(raw_events) if isinstance(raw_events, list) else 0
+    return total, len(_validate_events(raw_events))
+
+
+def recover_journal(path: Path):
+    return _validate_events(list(iter_journal(path)))
+
+
+def finalize_journal(journal_path: Path, destination: Path, codec=None) -> int:
+    created = read_journal_header(journal_path).get("created")
+    events = _reorder(
+        (_validate_event(raw) for raw in iter_journal(journal_path)),
+        JOURNAL_REORDER_SECONDS,
+    )
+    codec = codec or codec_for_path(destination)
+    if destination.suffix in (BINARY_SUFFIX, MANIFEST_SUFFIX) or codec.startswith("delta"):
+        events = list(events)
+        save_macro(events, destination, created=created, codec=codec)
+        return len(events)
+    header = json.dumps(
+        {
+            "version": 1,
+            "created": created or datetime.now().isoformat(timespec="seconds"),
+        }
+    )
+    count = 0
+    with open_output(destination, codec) as handle:
+        handle.write(header[:-1] + ', "events": [')
+        for event in events:
+            handle.write(",\n    " if count else "\n    ")
+            handle.write(json.dumps(event))
+            count += 1
+        handle.write("\n  ]\n}\n")
+    return count
+
+
+def _reorder(events, window_seconds: float):
+    pending = []
+    sequence = 0
+    newest = 0.0
+    for event in events:
+        if event is None:
+            continue
+        newest = max(newest, event["t"])
+        heapq.heappush(pending, (event["t"], sequence, event))
+        sequence += 1
+        while pending and pending[0][0] < newest - window_seconds:
+            yield heapq.heappop(pending)[2]
+    while pending:
+        yield heapq.heappop(pending)[2]
+
+
+def _read_macro(path: Path):
+    if is_binary_macro(path):
+        return read_binary(path)
+    if is_manifest(path):
+        created = read_manifest(path).get("created")
+        events = _validate_events(list(iter_manifest(path)))
+        return created if isinstance(created, str) else None, events
+    payload = read_payload(path)
+    if not isinstance(payload, dict):
+        return None, []
     events = _validate_events(payload.get("events", []))
-    return events
+    created = payload.get("created")
+    return created if isinstance(created, str) else None, events
 
 
 def _validate_events(raw_events):
@@ -26,36 +182,39 @@ def _validate_events(raw_events):
         return []
     cleaned = []
     for raw in raw_events:
-        if not isinstance(raw, dict):
-            continue
-        event_type = raw.get("type")
-        if event_type == "mouse_click":
-            event = _validate_mouse_click(raw)
-        elif event_type == "mouse_move":
-            event = _validate_mouse_move(raw)
-        elif event_type == "mouse_scroll":
-            event = _validate_mouse_scroll(raw)
-        elif event_type == "key":
-            event = _validate_key(raw)
-        else:
-            event = None
+        event = _validate_event(raw)
         if event is not None:
             cleaned.append(event)
     cleaned.sort(key=lambda item: item["t"])
     return cleaned
 
 
+def _validate_event(raw):
+    if not isinstance(raw, dict):
+        return None
+    event_type = raw.get("type")
+    if event_type == "mouse_click":
+        return _validate_mouse_click(raw)
+    if event_type == "mouse_move":
+        return _validate_mouse_move(raw)
+    if event_type == "mouse_scroll":
+        return _validate_mouse_scroll(raw)
+    if event_type == "key":
+        return _validate_key(raw)
+    return None
+
+
 def _coerce_float(value):
     try:
         return float(value)
-    except (TypeError, ValueError):
+    except (TypeError, ValueError, OverflowError):
         return None
 
 
 def _coerce_int(value):
     try:
         return int(value)
-    except (TypeError, ValueError):
+    except (TypeError, ValueError, OverflowError):
         return None
 
 
@@ -0,0 +1,42 @@
+from backends import NullBackend
+from cache import MacroCache
+from player import Player
+from storage import load_macro, save_macro
+
+
+def macro_events(count=5000):
+    return [
+        {"t": index * 1e-6, "type": "mouse_move", "x": index % 800, "y": 300}
+        for index in range(count)
+    ]
+
+
+def test_stream_caches_plan_and_events(tmp_path):
+    path = tmp_path / "macro.json"
+    save_macro(macro_events(), path)
+    cache = MacroCache()
+    player = Player(backend=NullBackend(), kill_switch=False)
+    plan, events = cache.stream(path, "plan", player.play_stream)
+    assert len(plan) == 5000
+    assert events == load_macro(path)
+    assert cache.peek(path, "plan") is plan
+    assert cache.load(path) == events
+    assert cache.stats()["misses"] == 0
+
+
+class StopOnFirstMove(NullBackend):
+    player = None
+
+    def move(self, x, y) -> None:
+        self.player.stop()
+
+
+def test_stopped_stream_is_not_cached(tmp_path):
+    path = tmp_path / "macro.json"
+    save_macro(macro_events(), path)
+    cache = MacroCache()
+    backend = StopOnFirstMove()
+    backend.player = Player(backend=backend, kill_switch=False)
+    plan, _ = cache.stream(path, "plan", backend.player.play_stream)
+    assert plan is None
+    assert cache.peek(path, "plan") is None
@@ -0,0 +1,129 @@
+import socket
+import time
+
+import pytest
+
+from backends import NullBackend
+from ipc import ControlClient, ControlServer
+from service import ControlService
+from storage import save_macro
+
+
+def macro_events(count=20, step=0.005):
+    return [
+        {"t": index * step, "type": "mouse_move", "x": index, "y": index}
+        for index in range(count)
+    ]
+
+
+def finished_status(client, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.request("status")
+        if status["last"] is not None or time.monotonic() > deadline:
+            return status
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def server():
+    control = ControlServer("127.0.0.1:0", ControlService(backend=NullBackend()))
+    control.start()
+    yield control
+    control.close()
+
+
+@pytest.fixture
+def client(server):
+    host, port = server.server_address
+    with ControlClient(f"{host}:{port}", timeout=5) as control_client:
+        yield control_client
+
+
+def test_load_play_status(tmp_path, server, client):
+    path = tmp_path / "short.json"
+    save_macro(macro_events(), path)
+    loaded = client.request("load", path=str(path), name="short")
+    assert loaded["ok"] and loaded["events"] == 20
+    played = client.request("play", name="short", wait=True, id=7)
+    assert played["ok"] and played["id"] == 7
+    assert played["events"] == 20
+    status = client.request("status")
+    assert status["ok"] and not status["busy"]
+    assert status["macros"] == {"short": str(path)}
+    assert status["last"]["events"] == 20
+
+
+def test_stop_cancels_running_playback(tmp_path, server, client):
+    path = tmp_path / "long.json"
+    save_macro(macro_events(count=200, step=0.05), path)
+    client.request("load", path=str(path), name="long")
+    assert client.request("play", name="long")["queued"]
+    assert client.request("status")["busy"]
+    assert client.request("stop")["ok"]
+    status = finished_status(client)
+    assert not status["busy"]
+    last = status["last"]
+    assert last.get("cancelled") or last["events"] < 200
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"speed": 0},
+        {"speed": "fast"},
+        {"repeat_count": 2.5},
+        {"mode": "forever"},
+        {"loop_seconds": -1},
+    ],
+)
+def test_play_rejects_bad_options(tmp_path, server, client, options):
+    path = tmp_path / "short.json"
+    save_macro(macro_events(), path)
+    client.request("load", path=str(path), name="short")
+    reply = client.request("play", name="short", wait=True, **options)
+    assert reply["ok"] is False
+    assert client.request("status")["last"] is None
+
+
+def test_unknown_macro_and_command(client):
+    assert client.request("play", name="missing")["ok"] is False
+    assert client.request("explode")["ok"] is False
+
+
+def test_play_after_close_reports_error(tmp_path, server, client):
+    path = tmp_path / "short.json"
+    save_macro(macro_events(), path)
+    client.request("load", path=str(path), name="short")
+    server.service.close()
+    reply = client.request("play", name="short")
+    assert reply["ok"] is False
+    assert "closed" in reply["error"]
+
+
+@pytest.mark.parametrize("address", ["0.0.0.0:0", "192.0.2.1:0", "[::]:0"])
+def test_tcp_server_refuses_non_loopback_hosts(address):
+    with pytest.raises(ValueError):
+        ControlServer(address, ControlService(backend=NullBackend()))
+
+
+def test_unix_server_refuses_to_replace_regular_file(tmp_path):
+    path = tmp_path / "macro.json"
+    save_macro(macro_events(), path)
+    with pytest.raises(FileExistsError):
+        ControlServer(str(path), ControlService(backend=NullBackend()))
+    assert path.exists()
+
+
+def test_unix_server_replaces_stale_socket(tmp_path):
+    address = str(tmp_path / "control.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(address)
+    stale.close()
+    control = ControlServer(address, ControlService(backend=NullBackend()))
+    control.start()
+    try:
+        with ControlClient(address, timeout=5) as control_client:
+            assert control_client.request("ping")["ok"]
+    finally:
+        control.close()
@@ -0,0 +1,51 @@
+import pytest
+
+from backends import CaptureBackend
+from service import ControlService
+
+
+def macro_events(count=50):
+    return [
+        {"t": index * 0.001, "type": "mouse_move", "x": index, "y": index}
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+def service():
+    control = ControlService(backend=CaptureBackend())
+    control.start()
+    yield control
+    control.close(timeout=1.0)
+
+
+def test_stop_right_after_submit_dispatches_nothing(service):
+    events = macro_events()
+    for _ in range(50):
+        job = service.play(events)
+        service.stop()
+        assert job.wait(5)
+        assert job.cancelled or job.stats["events"] == 0
+    assert service.backend.actions == []
+
+
+def test_stop_between_dequeue_and_play_is_kept(service):
+    events = macro_events()
+
+    def action(player):
+        service.stop()
+        player.play(events)
+
+    job = service.submit(action)
+    assert job.wait(5)
+    assert job.stats["events"] == 0
+    assert service.backend.actions == []
+
+
+def test_stop_before_submit_does_not_cancel_later_plays(service):
+    service.stop()
+    job = service.play(macro_events())
+    assert job.wait(5)
+    assert not job.cancelled
+    assert job.stats["events"] == 50
+    assert len(service.backend.actions) == 50
@@ -0,0 +1,94 @@
+import threading
+
+from backends import NullBackend
+from constants import CATCH_UP_STRICT
+from events import OP_MOVE
+from plan import PlaybackPlan
+from player import Player
+from timing import FakeClock, HybridScheduler, PollingScheduler, summarize_lateness
+
+MS = 1_000_000
+
+
+class StoppingClock(FakeClock):
+    def __init__(self, stop_event, stop_at_ns, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.stop_event = stop_event
+        self.stop_at_ns = stop_at_ns
+
+    def advance(self, delta_ns: int) -> None:
+        super().advance(delta_ns)
+        if self.now_ns() >= self.stop_at_ns:
+            self.stop_event.set()
+
+
+def test_hybrid_scheduler_absorbs_oversleep_with_guard():
+    clock = FakeClock(oversleep_ns=MS, yield_ns=10_000)
+    scheduler = HybridScheduler(clock, guard_ns=2 * MS)
+    stop = threading.Event()
+    for target in range(5 * MS, 105 * MS, 5 * MS):
+        woke = scheduler.sleep_until(target, stop)
+        assert 0 <= woke - target < clock.yield_ns
+    assert clock.yields > 0
+
+
+def test_polling_scheduler_is_late_by_the_oversleep():
+    clock = FakeClock(oversleep_ns=MS)
+    scheduler = PollingScheduler(clock)
+    woke = scheduler.sleep_until(5 * MS, threading.Event())
+    assert woke - 5 * MS == MS
+
+
+def test_hybrid_scheduler_wakes_within_a_slice_of_stop():
+    stop = threading.Event()
+    clock = StoppingClock(stop, stop_at_ns=31 * MS)
+    scheduler = HybridScheduler(clock, guard_ns=2 * MS, max_slice_ns=10 * MS)
+    woke = scheduler.sleep_until(1_000 * MS, stop)
+    assert stop.is_set()
+    assert 31 * MS <= woke <= 31 * MS + scheduler.max_slice_ns
+    assert clock.waits <= 5
+
+
+def test_hybrid_scheduler_returns_immediately_when_already_stopped():
+    stop = threading.Event()
+    stop.set()
+    clock = FakeClock()
+    woke = HybridScheduler(clock).sleep_until(1_000 * MS, stop)
+    assert woke == 0
+    assert clock.waits == 1
+
+
+def test_player_lateness_on_fake_clock():
+    clock = FakeClock(oversleep_ns=500_000, yield_ns=50_000)
+    scheduler = HybridScheduler(clock, guard_ns=MS)
+    plan = PlaybackPlan()
+    for i in range(100):
+        plan.append(i * 4 * MS, OP_MOVE, i, i)
+    player = Player(scheduler, NullBackend(), CATCH_UP_STRICT, kill_switch=False)
+    player.play(plan)
+    stats = player.timing_stats()
+    assert stats["events"] == 100
+    assert stats["max_ns"] < clock.yield_ns
+
+
+def test_summarize_lateness_percentiles():
+    stats = summarize_lateness(range(1, 101))
+    assert stats["events"] == 100
+    assert stats["mean_ns"] == 50
+    assert stats["p50_ns"] == 51
+    assert stats["p95_ns"] == 95
+    assert stats["p99_ns"] == 99
+    assert stats["max_ns"] == 100
+
+
+def test_summarize_lateness_empty_and_single():
+    assert summarize_lateness([]) == {
+        "events": 0,
+        "mean_ns": 0,
+        "p50_ns": 0,
+        "p95_ns": 0,
+        "p99_ns": 0,
+        "max_ns": 0,
+    }
+    stats = summarize_lateness([7])
+    assert stats["p50_ns"] == stats["p99_ns"] == stats["max_ns"] == 7
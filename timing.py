@@ -0,0 +1,110 @@
+import time
+
+DEFAULT_GUARD_NS = 2_000_000
+DEFAULT_MAX_SLICE_NS = 10_000_000
+
+
+class SystemClock:
+    def now_ns(self) -> int:
+        return time.perf_counter_ns()
+
+    def wait(self, stop_event, timeout_ns: int) -> bool:
+        return stop_event.wait(timeout_ns / 1e9)
+
+    def yield_cpu(self) -> None:
+        time.sleep(0)
+
+
+class FakeClock:
+    def __init__(self, start_ns=0, oversleep_ns=0, yield_ns=1_000) -> None:
+        self._now_ns = start_ns
+        self.oversleep_ns = oversleep_ns
+        self.yield_ns = yield_ns
+        self.waits = 0
+        self.yields = 0
+
+    def now_ns(self) -> int:
+        return self._now_ns
+
+    def advance(self, delta_ns: int) -> None:
+        self._now_ns += max(0, int(delta_ns))
+
+    def wait(self, stop_event, timeout_ns: int) -> bool:
+        self.waits += 1
+        if stop_event.is_set():
+            return True
+        self.advance(timeout_ns + self.oversleep_ns)
+        return stop_event.is_set()
+
+    def yield_cpu(self) -> None:
+        self.yields += 1
+        self.advance(self.yield_ns)
+
+
+class HybridScheduler:
+    def __init__(
+        self,
+        clock=None,
+        guard_ns=DEFAULT_GUARD_NS,
+        max_slice_ns=DEFAULT_MAX_SLICE_NS,
+    ) -> None:
+        self.clock = clock if clock is not None else SystemClock()
+        self.guard_ns = max(0, int(guard_ns))
+        self.max_slice_ns = max(1, int(max_slice_ns))
+
+    def now_ns(self) -> int:
+        return self.clock.now_ns()
+
+    def sleep_until(self, target_ns: int, stop_event) -> int:
+        clock = self.clock
+        while True:
+            remaining = target_ns - clock.now_ns()
+            if remaining <= self.guard_ns:
+                break
+            timeout = min(remaining - self.guard_ns, self.max_slice_ns)
+            if clock.wait(stop_event, timeout):
+                return clock.now_ns()
+        while True:
+            now = clock.now_ns()
+            if now >= target_ns or stop_event.is_set():
+                return now
+            clock.yield_cpu()
+
+
+class PollingScheduler:
+    def __init__(self, clock=None, slice_ns=DEFAULT_MAX_SLICE_NS) -> None:
+        self.clock = clock if clock is not None else SystemClock()
+        self.slice_ns = max(1, int(slice_ns))
+
+    def now_ns(self) -> int:
+        return self.clock.now_ns()
+
+    def sleep_until(self, target_ns: int, stop_event) -> int:
+        clock = self.clock
+        while True:
+            now = clock.now_ns()
+            remaining = target_ns - now
+            if remaining <= 0:
+                return now
+            if clock.wait(stop_event, min(remaining, self.slice_ns)):
+                return clock.now_ns()
+
+
+def _percentile(ordered, fraction: float) -> int:
+    if not ordered:
+        return 0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize_lateness(samples_ns) -> dict:
+    ordered = sorted(samples_ns)
+    count = len(ordered)
+    return {
+        "events": count,
+        "mean_ns": sum(ordered) // count if count else 0,
+        "p50_ns": _percentile(ordered, 0.50),
+        "p95_ns": _percentile(ordered, 0.95),
+        "p99_ns": _percentile(ordered, 0.99),
+        "max_ns": ordered[-1] if count else 0,
+    }